@@ -14,6 +14,7 @@ import json
 import os
 
 from common.detector_result import DetectorResult
+from common.result_store import is_columnar, read_columnar
 
 DETECTOR_NAMES = {
     "hypoparsr": "HypoParsr",
@@ -55,38 +56,57 @@ def clean_detector_name(detector):
     return abbr.replace("_", "\\_")
 
 
-def load_detector_results(result_file):
-    """
-    Load the results from a given detector result file. Verify each record in 
-    the process.
-    """
-    detector_names = set()
-    results = {}
+def _load_jsonl_records(result_file, validate=True):
+    records = []
     with open(result_file, "r") as fid:
-        for idx, line in enumerate(fid.readlines()):
+        for idx, line in enumerate(fid):
             try:
-                record = DetectorResult.from_json(line.strip())
+                records.append(
+                    DetectorResult.from_json(line.strip(), validate=validate)
+                )
             except json.JSONDecodeError:
                 print(
                     "\nError parsing the following record in file (line %i): "
                     "%s\n---\n%s" % (idx + 1, result_file, line.strip())
                 )
                 raise SystemExit(1)
+    return records
 
-            detector_names.add(record.detector)
 
-            fname = record.filename
-            if not os.path.isabs(fname):
-                fname = os.path.abspath(fname)
-                record.filename = fname
-            if fname in results:
-                raise ValueError(
-                    "Duplicate result for file %s in detector file %s"
-                    % (record.filename, result_file)
-                )
+def load_detector_results(result_file, validate=True):
+    """
+    Load the results from a given detector result file, which can be in JSON 
+    lines or in columnar format. Records are verified when they are read from 
+    JSON (unless validate is False) and before they are written to the 
+    columnar format.
+    """
+    if is_columnar(result_file):
+        records = read_columnar(result_file)
+    else:
+        records = _load_jsonl_records(result_file, validate=validate)
 
-            record.validate()
-            results[fname] = record
+    detector_names = set()
+    results = {}
+    # the files are in a handful of directories, so only these are made
+    # absolute
+    abs_dirs = {}
+    for record in records:
+        detector_names.add(record.detector)
+
+        fname = record.filename
+        if not os.path.isabs(fname):
+            dirname, basename = os.path.split(fname)
+            if not dirname in abs_dirs:
+                abs_dirs[dirname] = os.path.abspath(dirname)
+            fname = os.path.join(abs_dirs[dirname], basename)
+            record.filename = fname
+        if fname in results:
+            raise ValueError(
+                "Duplicate result for file %s in detector file %s"
+                % (record.filename, result_file)
+            )
+
+        results[fname] = record
 
     if len(detector_names) > 1:
         raise ValueError(
@@ -13,324 +13,301 @@ License: See the LICENSE file.
 import argparse
 import json
 
+import numpy as np
+
 from common.dialect import ATTRIBUTES
 from common.detector_result import Status
 
 from .core import load_detector_results, is_standard_dialect
 
 
-def prop_equal(res1, res2, attr_name):
-    return getattr(res1.dialect, attr_name) == getattr(res2.dialect, attr_name)
-
+def align_reference(reference):
+    """
+    Collect the reference results in arrays, ordered by filename. The 
+    detector results are aligned to these arrays by ``align_detector``, such 
+    that all metrics below are reductions over aligned arrays.
+    """
+    fnames = sorted(reference.keys())
+    records = [reference[f] for f in fnames]
+    ok = [r.status == Status.OK for r in records]
+    ref = {
+        "filename": fnames,
+        "ok": np.array(ok, dtype=bool),
+        "original_detector": np.array(
+            [r.original_detector for r in records], dtype=object
+        ),
+        "standard": np.array(
+            [o and is_standard_dialect(r.dialect) for r, o in zip(records, ok)],
+            dtype=bool,
+        ),
+    }
+    for attr_name in ATTRIBUTES:
+        ref[attr_name] = np.array(
+            [getattr(r.dialect, attr_name) if o else "" for r, o in 
+                zip(records, ok)],
+            dtype=object,
+        )
+    return ref
 
-def compute_attribute_accuracy(
-    reference, detector, attr_name, detector_name, original_detector=None
-):
-    n_equal, n_total = 0, 0
-    od = original_detector
 
-    for fname in reference:
-        res_ref = reference[fname]
+def align_detector(ref, detector, detector_name):
+    """
+    Join the detector results with the reference results on filename. 
+    Results for files that are not in the reference are ignored.
+    """
+    records = []
+    for fname in ref["filename"]:
         if not fname in detector:
             print(
                 "Warning: no result for %s in for detector %s"
                 % (fname, detector_name)
             )
-            continue
-        res_det = detector[fname]
-        if od is not None and res_ref.original_detector != od:
-            continue
-        if not res_ref.status == Status.OK:
-            continue
-        n_total += 1
-        if res_det.status == Status.OK:
-            n_equal += prop_equal(res_ref, res_det, attr_name)
+        records.append(detector.get(fname, None))
+    present = [not r is None for r in records]
+    ok = [p and r.status == Status.OK for r, p in zip(records, present)]
+    det = {
+        "records": records,
+        "present": np.array(present, dtype=bool),
+        "ok": np.array(ok, dtype=bool),
+        "fail": np.array(
+            [p and r.status == Status.FAIL for r, p in zip(records, present)],
+            dtype=bool,
+        ),
+        # kept as Python objects so the runtimes are written to the summary 
+        # unchanged
+        "runtime": np.array(
+            [r.runtime if p else None for r, p in zip(records, present)],
+            dtype=object,
+        ),
+    }
+    for attr_name in ATTRIBUTES:
+        det[attr_name] = np.array(
+            [getattr(r.dialect, attr_name) if o else "" for r, o in 
+                zip(records, ok)],
+            dtype=object,
+        )
+    det["correct"] = det["ok"] & ref["ok"]
+    for attr_name in ATTRIBUTES:
+        det["correct"] &= det[attr_name] == ref[attr_name]
+    return det
 
-    return n_equal / n_total
 
+def reference_mask(ref, original_detector=None):
+    mask = ref["ok"].copy()
+    if not original_detector is None:
+        mask &= ref["original_detector"] == original_detector
+    return mask
 
-def compute_overall_accuracy(
-    reference, detector, detector_name, original_detector=None
-):
-    n_equal, n_total = 0, 0
-    od = original_detector
-    for fname in reference:
-        res_ref = reference[fname]
-        if not fname in detector:
-            print(
-                "Warning: no result for %s in for detector %s"
-                % (fname, detector_name)
-            )
-            continue
-        res_det = detector[fname]
-        if od is not None and res_ref.original_detector != od:
-            continue
-        if not res_ref.status == Status.OK:
-            continue
-        n_total += 1
-        if res_det.status == Status.OK:
-            n_equal += res_ref.dialect == res_det.dialect
+
+def compute_attribute_accuracy(ref, det, attr_name, original_detector=None):
+    mask = det["present"] & reference_mask(ref, original_detector)
+    equal = det["ok"] & (det[attr_name] == ref[attr_name])
+    n_equal = int(np.count_nonzero(mask & equal))
+    n_total = int(np.count_nonzero(mask))
     return n_equal / n_total
 
 
-def compute_standard_accuracy(reference, detector, standard=True):
-    total_standard, total_messy = 0, 0
-    correct_standard, correct_messy = 0, 0
-    for fname in reference:
-        res_ref = reference[fname]
-        if not res_ref.status == Status.OK:
-            continue
-        if not fname in detector:
-            print("Warning: no result for file: %s" % fname)
-            continue
-        res_det = detector[fname]
+def compute_overall_accuracy(ref, det, original_detector=None):
+    mask = det["present"] & reference_mask(ref, original_detector)
+    n_equal = int(np.count_nonzero(mask & det["correct"]))
+    n_total = int(np.count_nonzero(mask))
+    return n_equal / n_total
 
-        is_std = is_standard_dialect(res_ref.dialect)
-        if is_std:
-            total_standard += 1
-        else:
-            total_messy += 1
 
-        if not res_det.status == Status.OK:
-            continue
+def compute_standard_accuracy(ref, det, standard=True):
+    mask = det["present"] & ref["ok"]
+    mask &= ref["standard"] if standard else ~ref["standard"]
+    n_correct = int(np.count_nonzero(mask & det["correct"]))
+    n_total = int(np.count_nonzero(mask))
+    return n_correct / n_total
 
-        is_correct = res_det.dialect == res_ref.dialect
-        if is_std:
-            correct_standard += 1 if is_correct else 0
-        else:
-            correct_messy += 1 if is_correct else 0
-    if standard:
-        return correct_standard / total_standard
-    return correct_messy / total_messy
-
-
-def compute_fail_percentage(reference, detector, detector_name):
-    n_fail, n_total = 0, 0
-    for fname in reference:
-        if reference[fname].status == Status.OK:
-            n_total += 1
-        else:
-            continue
-        if not fname in detector:
-            print(
-                "Warning: no result for %s in for detector %s"
-                % (fname, detector_name)
-            )
-            continue
-        if detector[fname].status == Status.FAIL:
-            n_fail += 1
+
+def compute_fail_percentage(ref, det):
+    # files without a detector result count towards the total
+    n_fail = int(np.count_nonzero(ref["ok"] & det["present"] & det["fail"]))
+    n_total = int(np.count_nonzero(ref["ok"]))
     return n_fail / n_total
 
 
-def compute_nic_split_accuracy(reference, detector, mode=None):
-    files_total = 0
-    files_with_mode = 0
-    for fname in reference:
-        res_ref = reference[fname]
-        if not res_ref.status == Status.OK:
-            continue
-        if not fname in detector:
-            print("Warning: no result for file: %s" % fname)
-            continue
-        res_det = detector[fname]
-
-        files_total += 1
-
-        if mode == "no_results":
-            if not res_det.status == Status.OK:
-                files_with_mode += 1
-        elif mode == "incorrect_results":
-            if (
-                res_det.status == Status.OK
-                and res_det.dialect != res_ref.dialect
-            ):
-                files_with_mode += 1
-        elif mode == "correct_results":
-            if (
-                res_det.status == Status.OK
-                and res_det.dialect == res_ref.dialect
-            ):
-                files_with_mode += 1
-        else:
-            raise ValueError("Unknown mode: %r" % mode)
+def compute_nic_split_accuracy(ref, det, mode=None):
+    mask = det["present"] & ref["ok"]
+    if mode == "no_results":
+        with_mode = ~det["ok"]
+    elif mode == "incorrect_results":
+        with_mode = det["ok"] & ~det["correct"]
+    elif mode == "correct_results":
+        with_mode = det["correct"]
+    else:
+        raise ValueError("Unknown mode: %r" % mode)
+    files_with_mode = int(np.count_nonzero(mask & with_mode))
+    files_total = int(np.count_nonzero(mask))
     return files_with_mode / files_total
 
-def collect_computation_times(reference, detector, detector_name):
-    runtimes = []
-    for fname in sorted(reference.keys()):
-        if not reference[fname].status == Status.OK:
-            continue
-        if not fname in detector:
-            print(
-                "Warning: no result for %s in for detector %s"
-                % (fname, detector_name)
-            )
-            continue
-        # Note that we don't check whether the detector returned with status
-        # OK, because we want to include failures and timeouts in the runtime
-        # plots as well.
-        rt = detector[fname].runtime
-        if rt is None:
-            raise ValueError(
-                "Runtime is None for result: %r" % detector[fname]
-            )
-        runtimes.append(detector[fname].runtime)
-
-    return runtimes
-
 
-def count_reference_ok(reference, original_detector=None):
-    n_ok = 0
-    od = original_detector
-    for fname in reference:
-        if od is not None and reference[fname].original_detector != od:
+def collect_computation_times(ref, det):
+    # Note that we don't check whether the detector returned with status OK,
+    # because we want to include failures and timeouts in the runtime plots
+    # as well.
+    mask = det["present"] & ref["ok"]
+    runtimes = det["runtime"][mask]
+    missing = np.equal(runtimes, None)
+    if missing.any():
+        idx = np.flatnonzero(mask)[np.argmax(missing)]
+        raise ValueError(
+            "Runtime is None for result: %r" % det["records"][idx]
+        )
+    return runtimes.tolist()
+
+
+def aggregate_stats(ref, det):
+    """
+    Sum the stage timings and counters of the results that have them, for the 
+    same files as the runtimes. Returns None if no result has stats.
+    """
+    mask = det["present"] & ref["ok"]
+    timings, counters = {}, {}
+    n_files = 0
+    for idx in np.flatnonzero(mask):
+        stats = det["records"][idx].stats
+        if stats is None:
             continue
-        if reference[fname].status == Status.OK:
-            n_ok += 1
-    return n_ok
+        n_files += 1
+        for name, value in stats.get("timings", {}).items():
+            timings[name] = timings.get(name, 0) + value
+        for name, value in stats.get("counters", {}).items():
+            counters[name] = counters.get(name, 0) + value
+    if n_files == 0:
+        return None
+    return {
+        "n_files": n_files,
+        "timings": {k: timings[k] for k in sorted(timings)},
+        "counters": {k: counters[k] for k in sorted(counters)},
+    }
 
 
-def count_standard(reference_results, standard=True):
-    count = 0
-    for fname in reference_results:
-        ref = reference_results[fname]
-        if not ref.status == Status.OK:
-            continue
+def count_reference_ok(ref, original_detector=None):
+    return int(np.count_nonzero(reference_mask(ref, original_detector)))
 
-        is_std = is_standard_dialect(ref.dialect)
-        if standard:
-            if is_std:
-                count += 1
-        else:
-            if not is_std:
-                count += 1
-    return count
 
+def count_standard(ref, standard=True):
+    mask = ref["standard"] if standard else ~ref["standard"]
+    return int(np.count_nonzero(ref["ok"] & mask))
 
-def summarize_accuracy(
-    reference_results, detector_results_all, original_detector=None
-):
+
+def summarize_accuracy(ref, aligned, original_detector=None):
     accuracy = {}
     for attr_name in ATTRIBUTES:
         accuracy[attr_name] = {}
-        for detector in detector_results_all:
-            detector_results = detector_results_all[detector]
+        for detector in aligned:
             accuracy[attr_name][detector] = compute_attribute_accuracy(
-                reference_results,
-                detector_results,
+                ref,
+                aligned[detector],
                 attr_name,
-                detector,
                 original_detector=original_detector,
             )
 
     assert "overall" not in accuracy.keys()
     accuracy["overall"] = {}
-    for detector in detector_results_all:
-        detector_results = detector_results_all[detector]
+    for detector in aligned:
         accuracy["overall"][detector] = compute_overall_accuracy(
-            reference_results,
-            detector_results,
-            detector,
-            original_detector=original_detector,
+            ref, aligned[detector], original_detector=original_detector
         )
     return accuracy
 
 
-def summarize_standard_accuracy(
-    reference_results, detector_results_all, standard=True
-):
-
+def summarize_standard_accuracy(ref, aligned, standard=True):
     accuracy = {}
-    for detector in detector_results_all:
-        detector_results = detector_results_all[detector]
+    for detector in aligned:
         accuracy[detector] = compute_standard_accuracy(
-            reference_results, detector_results, standard=standard
+            ref, aligned[detector], standard=standard
         )
     return accuracy
 
 
-def summarize_nic_split_accuracy(
-    reference_results, detector_results_all, mode=None
-):
+def summarize_nic_split_accuracy(ref, aligned, mode=None):
     allowed_modes = ["no_results", "incorrect_results", "correct_results"]
     if mode is None or not mode in allowed_modes:
         raise ValueError("mode must be one of: %r" % allowed_modes)
 
     accuracies = {}
-    for detector in detector_results_all:
-        detector_results = detector_results_all[detector]
+    for detector in aligned:
         accuracies[detector] = compute_nic_split_accuracy(
-            reference_results, detector_results, mode=mode
+            ref, aligned[detector], mode=mode
         )
     return accuracies
 
 
 def create_summary(reference_results, detector_results_all):
+    # Join the results of all detectors with the reference once
+    ref = align_reference(reference_results)
+    aligned = {}
+    for detector in detector_results_all:
+        aligned[detector] = align_detector(
+            ref, detector_results_all[detector], detector
+        )
+
     summary = {}
-    summary["n_files_all"] = count_reference_ok(
-        reference_results, original_detector=None
-    )
+    summary["n_files_all"] = count_reference_ok(ref, original_detector=None)
     summary["n_files_human"] = count_reference_ok(
-        reference_results, original_detector="human"
+        ref, original_detector="human"
     )
     summary["n_files_normal"] = count_reference_ok(
-        reference_results, original_detector="normal"
-    )
-    summary["n_files_standard"] = count_standard(
-        reference_results, standard=True
-    )
-    summary["n_files_messy"] = count_standard(
-        reference_results, standard=False
+        ref, original_detector="normal"
     )
+    summary["n_files_standard"] = count_standard(ref, standard=True)
+    summary["n_files_messy"] = count_standard(ref, standard=False)
 
     # Compute accuracy
     summary["detection_accuracy_all"] = summarize_accuracy(
-        reference_results, detector_results_all, original_detector=None
+        ref, aligned, original_detector=None
     )
     summary["detection_accuracy_human"] = summarize_accuracy(
-        reference_results, detector_results_all, original_detector="human"
+        ref, aligned, original_detector="human"
     )
     summary["detection_accuracy_normal"] = summarize_accuracy(
-        reference_results, detector_results_all, original_detector="normal"
+        ref, aligned, original_detector="normal"
     )
 
     # Compute standard/non-standard split
     summary["standard_accuracy_all"] = summarize_standard_accuracy(
-        reference_results, detector_results_all, standard=True
+        ref, aligned, standard=True
     )
     summary["messy_accuracy_all"] = summarize_standard_accuracy(
-        reference_results, detector_results_all, standard=False
+        ref, aligned, standard=False
     )
 
     # Compute No result/Incorrect results/Correct result split
     summary["no_result_all"] = summarize_nic_split_accuracy(
-        reference_results, detector_results_all, mode="no_results"
+        ref, aligned, mode="no_results"
     )
     summary["incorrect_result_all"] = summarize_nic_split_accuracy(
-        reference_results, detector_results_all, mode="incorrect_results"
+        ref, aligned, mode="incorrect_results"
     )
     summary["correct_result_all"] = summarize_nic_split_accuracy(
-        reference_results, detector_results_all, mode="correct_results"
+        ref, aligned, mode="correct_results"
     )
 
     # Compute failure rates
     failures = {}
-    for detector in detector_results_all:
-        detector_results = detector_results_all[detector]
-        failures[detector] = compute_fail_percentage(
-            reference_results, detector_results, detector
-        )
+    for detector in aligned:
+        failures[detector] = compute_fail_percentage(ref, aligned[detector])
     summary["failures"] = failures
 
     # Collect runtimes
     runtimes = {}
-    for detector in detector_results_all:
-        detector_results = detector_results_all[detector]
-        runtimes[detector] = collect_computation_times(
-            reference_results, detector_results, detector
-        )
+    for detector in aligned:
+        runtimes[detector] = collect_computation_times(ref, aligned[detector])
     summary["runtimes"] = runtimes
 
+    # Aggregate the stage timings and counters, if they were recorded
+    stats = {}
+    for detector in aligned:
+        det_stats = aggregate_stats(ref, aligned[detector])
+        if not det_stats is None:
+            stats[detector] = det_stats
+    if stats:
+        summary["stats"] = stats
+
     return summary
 
 
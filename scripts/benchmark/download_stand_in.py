@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Local stand-in for the data servers, to check the downloader.
+
+The server fails a number of times before it serves a file, or responds
+slowly, which exercises the retries with backoff and the limit on the number
+of simultaneous downloads from a host in ``data_download``. Run the checks
+from the scripts directory with ``python -m doctest
+benchmark/download_stand_in.py``.
+
+>>> import hashlib, os, shutil, tempfile
+>>> from data_download import (
+...     RetryableError, download_all, download_url, fetch_url
+... )
+>>> server, base_url = serve()
+>>> output_dir = tempfile.mkdtemp()
+>>> data = b"a,b\\r\\n1,2\\r\\n"
+>>> md5 = hashlib.md5(data).hexdigest()
+>>> with tempfile.TemporaryFile() as fid:
+...     try:
+...         fetch_url(base_url + "/flaky/1/x", fid)
+...     except RetryableError as err:
+...         print(err)
+Status code 503
+>>> target = download_url(
+...     [base_url + "/flaky/2/x"], md5, output_dir, retries=2, backoff=0.01
+... )
+>>> target == os.path.join(output_dir, md5 + ".csv")
+True
+>>> download_url(
+...     [base_url + "/flaky/5/y"], md5, output_dir, retries=1, backoff=0.01
+... ) is None
+True
+>>> shutil.rmtree(output_dir)
+
+Errors that aren't retried are raised, without leaving the temporary file:
+
+>>> output_dir = tempfile.mkdtemp()
+>>> tempfile.tempdir = output_dir
+>>> try:
+...     download_url(["nothttp://127.0.0.1/x"], md5, output_dir)
+... except Exception as err:
+...     print(type(err).__name__)
+InvalidSchema
+>>> os.listdir(output_dir)
+[]
+>>> tempfile.tempdir = None
+>>> shutil.rmtree(output_dir)
+
+The number of simultaneous downloads from a host is limited:
+
+>>> output_dir = tempfile.mkdtemp()
+>>> url_and_hash = [
+...     {"urls": [base_url + "/slow/%i" % i], "md5": md5} for i in range(6)
+... ]
+>>> download_all(url_and_hash, output_dir, n_jobs=6, max_per_host=2)
+... # doctest: +ELLIPSIS
+Downloaded file '...'
+Downloaded file '...'
+Downloaded file '...'
+Downloaded file '...'
+Downloaded file '...'
+Downloaded file '...'
+>>> server.max_active
+2
+>>> server.shutdown()
+>>> shutil.rmtree(output_dir)
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    The path ``/flaky/<n>/<name>`` fails with status 503 the first n times, 
+    ``/slow/<name>`` takes a while to respond, and both serve the same CSV 
+    file. The server counts the requests per path and the largest number of 
+    requests that were handled at once.
+    """
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.counts[self.path] = server.counts.get(self.path, 0) + 1
+            count = server.counts[self.path]
+        try:
+            parts = self.path.split("/")
+            if parts[1] == "flaky" and count <= int(parts[2]):
+                self.send_response(503)
+                self.end_headers()
+                return
+            if parts[1] == "slow":
+                time.sleep(0.1)
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"a,b\r\n1,2\r\n")
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def serve():
+    """ Start the stand-in server in a thread, returns the server and url """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.lock = threading.Lock()
+    server.active = 0
+    server.max_active = 0
+    server.counts = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, "http://127.0.0.1:%i" % server.server_address[1]
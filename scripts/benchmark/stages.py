@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the stages of the detection pipeline on synthetic CSV files.
+
+For every configuration in ``synthetic.CONFIGS`` a file is generated and the
+stages of the pipeline are timed separately (micro benchmarks), as well as the
+full detection by some of the detectors (macro benchmarks). The minimum over a
+number of repetitions is reported.
+
+The results are stored in a JSON file named after the current commit, such
+that the results of different commits can be compared with the ``compare``
+function below to find regressions.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import tempfile
+import time
+
+from tabulate import tabulate
+
+from common.dialect import Dialect
+from common.encoding import get_encoding
+from common.load import load_file
+from common.parser import parse_file
+from detection import our_score_full, suitability
+from detection._ties import break_ties
+from detection.lib.types.rudi_types import eval_types
+from detection.our_score_base import (
+    filter_urls,
+    get_potential_dialects,
+    make_abstraction,
+)
+
+from .synthetic import CONFIGS, generate_config
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = [
+    "get_encoding",
+    "load_file",
+    "filter_urls",
+    "get_potential_dialects",
+    "make_abstraction",
+    "parse_file",
+    "eval_types",
+    "break_ties",
+    "detect_our_score_full",
+    "detect_suitability",
+]
+
+# Slowdown factor above which a stage is reported as a regression
+REGRESSION_FACTOR = 1.2
+
+
+def get_commit():
+    try:
+        out = subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=SCRIPT_DIR,
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return out.decode().strip()
+
+
+def time_func(func, repeats):
+    """ Return the minimum runtime of the function and its output """
+    runtimes = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        out = func()
+        runtimes.append(time.perf_counter() - start_time)
+    return min(runtimes), out
+
+
+def tie_dialects(dialect):
+    """ Two dialects that differ only in the quotechar, for break_ties """
+    other = "" if dialect.quotechar else '"'
+    return [dialect, Dialect(dialect.delimiter, other, dialect.escapechar)]
+
+
+def run_config(name, repeats=3):
+    text, dialect = generate_config(name)
+    tmpfd, tmpfname = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(tmpfd, "w", newline="") as fid:
+        fid.write(text)
+
+    timings = {}
+    try:
+        timings["get_encoding"], encoding = time_func(
+            lambda: get_encoding(tmpfname), repeats
+        )
+        timings["load_file"], data = time_func(
+            lambda: load_file(tmpfname, encoding=encoding), repeats
+        )
+        timings["filter_urls"], filtered = time_func(
+            lambda: filter_urls(data), repeats
+        )
+        timings["get_potential_dialects"], dialects = time_func(
+            lambda: get_potential_dialects(filtered, encoding), repeats
+        )
+        timings["make_abstraction"], _ = time_func(
+            lambda: [make_abstraction(data, d) for d in dialects], repeats
+        )
+        timings["parse_file"], rows = time_func(
+            lambda: parse_file(data, dialect=dialect), repeats
+        )
+        timings["eval_types"], _ = time_func(
+            lambda: [eval_types(cell) for row in rows for cell in row],
+            repeats,
+        )
+        timings["break_ties"], _ = time_func(
+            lambda: break_ties(data, tie_dialects(dialect)), repeats
+        )
+        timings["detect_our_score_full"], _ = time_func(
+            lambda: our_score_full.wrap_determine_dqr(tmpfname), repeats
+        )
+        timings["detect_suitability"], _ = time_func(
+            lambda: suitability.determine_dqr(tmpfname), repeats
+        )
+    finally:
+        os.unlink(tmpfname)
+
+    return {
+        "n_chars": len(text),
+        "n_dialects": len(dialects),
+        "timings": timings,
+    }
+
+
+def run_stages(configs=None, repeats=3):
+    configs = list(CONFIGS.keys()) if configs is None else configs
+    results = {
+        "commit": get_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "hostname": socket.gethostname(),
+        "python": platform.python_version(),
+        "repeats": repeats,
+        "configs": {},
+    }
+    for name in configs:
+        print("[benchmark] Running configuration: %s" % name)
+        results["configs"][name] = run_config(name, repeats=repeats)
+    return results
+
+
+def print_results(results):
+    configs = list(results["configs"].keys())
+    table = []
+    for stage in STAGES:
+        row = [stage]
+        for name in configs:
+            row.append("%.4f" % results["configs"][name]["timings"][stage])
+        table.append(row)
+    table.append(
+        ["n_dialects"] + [results["configs"][c]["n_dialects"] for c in configs]
+    )
+    print(tabulate(table, headers=["stage (s)"] + configs))
+
+
+def compare(old, new, factor=REGRESSION_FACTOR):
+    """ Print the ratio of the timings of two benchmark runs """
+    configs = [c for c in new["configs"] if c in old["configs"]]
+    table = []
+    regressions = []
+    for stage in STAGES:
+        row = [stage]
+        for name in configs:
+            t_old = old["configs"][name]["timings"].get(stage, None)
+            t_new = new["configs"][name]["timings"].get(stage, None)
+            if t_old is None or t_new is None or t_old == 0:
+                row.append("")
+                continue
+            ratio = t_new / t_old
+            row.append("%.2f" % ratio)
+            if ratio > factor:
+                regressions.append((name, stage, ratio))
+        table.append(row)
+    print(
+        "Ratio of runtimes %s / %s" % (new["commit"], old["commit"])
+    )
+    print(tabulate(table, headers=["stage"] + configs))
+    for name, stage, ratio in regressions:
+        print(
+            "Regression: %s on %s is %.2f times slower" % (stage, name, ratio)
+        )
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the stages of the detection pipeline"
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        dest="configs",
+        help="configuration to run (can be repeated, default: all)",
+        action="append",
+        choices=list(CONFIGS.keys()),
+    )
+    parser.add_argument(
+        "-n", "--repeats", help="number of repetitions", type=int, default=3
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        help="directory to store the results in, one file per commit",
+        default=None,
+    )
+    parser.add_argument(
+        "--compare",
+        help="result file of an earlier commit to compare with",
+        default=None,
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = run_stages(configs=args.configs, repeats=args.repeats)
+    print_results(results)
+
+    if not args.output_dir is None:
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_file = os.path.join(
+            args.output_dir, "%s.json" % results["commit"]
+        )
+        with open(output_file, "w") as fid:
+            fid.write(json.dumps(results, indent=2))
+        print("Results written to: %s" % output_file)
+
+    if not args.compare is None:
+        with open(args.compare, "r") as fid:
+            old = json.load(fid)
+        compare(old, results)
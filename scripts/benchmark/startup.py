@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the startup time of the detectors.
+
+Every detector is run as a separate process on a tiny CSV file, such that the 
+measured time is dominated by starting Python and importing the detector. The 
+median over a number of repetitions is compared to the target startup time.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tabulate import tabulate
+
+# Target for the median startup time (seconds) of a single detector run
+STARTUP_TARGET = 0.3
+
+DETECTORS = [
+    "sniffer",
+    "suitability",
+    "our_score_pattern_only",
+    "our_score_type_only",
+    "our_score_full_no_tie",
+    "our_score_full",
+]
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_startup(detector, filename, repeats=5):
+    cmd = [
+        sys.executable,
+        os.path.join(SCRIPT_DIR, "run_detector.py"),
+        detector,
+        filename,
+    ]
+    runtimes = []
+    for _ in range(repeats):
+        start_time = time.time()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+        runtimes.append(time.time() - start_time)
+    return runtimes
+
+
+def run_startup(detectors=None, repeats=5):
+    """ Return the median startup time for each detector """
+    detectors = DETECTORS if detectors is None else detectors
+    tmpfd, tmpfname = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(tmpfd, "w") as fid:
+        fid.write("a,b\n1,2\n")
+    try:
+        return {
+            d: statistics.median(time_startup(d, tmpfname, repeats=repeats))
+            for d in detectors
+        }
+    finally:
+        os.unlink(tmpfname)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the startup time of the detectors"
+    )
+    parser.add_argument(
+        "-d",
+        "--detector",
+        dest="detectors",
+        help="detector to benchmark (can be repeated, default: all)",
+        action="append",
+        choices=DETECTORS,
+    )
+    parser.add_argument(
+        "-n", "--repeats", help="number of repetitions", type=int, default=5
+    )
+    parser.add_argument(
+        "-t",
+        "--target",
+        help="target startup time in seconds",
+        type=float,
+        default=STARTUP_TARGET,
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    medians = run_startup(detectors=args.detectors, repeats=args.repeats)
+    table = [
+        [d, "%.3f" % t, "yes" if t <= args.target else "NO"]
+        for d, t in medians.items()
+    ]
+    print(tabulate(table, headers=["detector", "median (s)", "on target"]))
+    if any(t > args.target for t in medians.values()):
+        raise SystemExit(1)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Generators for synthetic CSV files used in the benchmarks.
+
+The generated files vary in size (number of rows), width (number of columns),
+the use of quotes and escape characters, and the number of potential dialects.
+The latter is controlled by adding punctuation characters to the cells, since
+every character that can be a delimiter gives rise to more dialects to
+consider. The generators are seeded, so the same configuration always gives
+the same file.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import random
+
+from common.dialect import Dialect
+
+WORDS = [
+    "alpha",
+    "beta",
+    "gamma delta",
+    "12",
+    "3.1415",
+    "-7",
+    "2018-11-26",
+    "12:30",
+    "N/A",
+    "",
+    "50%",
+    "http://www.example.com/a?b=1",
+]
+
+# characters that are added to cells to increase the number of dialects
+NOISE_CHARS = ["|", ";", ":", "#", "!", "*", "+", "&", "=", "^"]
+
+# name: (n_rows, n_cols, delimiter, quotechar, escapechar, quote_prob,
+#        escape_prob, n_noise)
+CONFIGS = {
+    "small": (100, 5, ",", '"', "", 0.1, 0.0, 0),
+    "long": (5000, 5, ",", '"', "", 0.1, 0.0, 0),
+    "wide": (200, 100, ",", '"', "", 0.1, 0.0, 0),
+    "quoted": (2000, 10, ";", '"', "", 0.9, 0.0, 0),
+    "escaped": (2000, 10, ",", '"', "\\", 0.3, 0.2, 0),
+    "no_quotes": (2000, 10, "\t", "", "", 0.0, 0.0, 0),
+    "many_dialects": (2000, 10, ",", "'", "", 0.2, 0.0, 8),
+}
+
+
+def make_cell(rng, delimiter, quotechar, escapechar, quote_prob, escape_prob,
+        noise):
+    cell = rng.choice(WORDS)
+    if noise and rng.random() < 0.2:
+        cell += rng.choice(noise)
+    if quotechar and rng.random() < quote_prob:
+        # include the delimiter in quoted cells so the quotes have a function
+        cell = cell + delimiter + rng.choice(WORDS)
+        if escapechar and rng.random() < escape_prob:
+            cell = cell + escapechar + quotechar
+        elif rng.random() < 0.1:
+            cell = cell + quotechar + quotechar
+        return quotechar + cell + quotechar
+    if escapechar and rng.random() < escape_prob:
+        return cell + escapechar + delimiter + rng.choice(WORDS)
+    return cell
+
+
+def generate_csv(
+    n_rows,
+    n_cols,
+    delimiter=",",
+    quotechar='"',
+    escapechar="",
+    quote_prob=0.1,
+    escape_prob=0.0,
+    n_noise=0,
+    seed=42,
+):
+    """ Generate the text of a CSV file with the given properties
+
+    >>> generate_csv(2, 3, n_noise=2, seed=1).count("\\r\\n")
+    2
+    """
+    rng = random.Random(seed)
+    noise = NOISE_CHARS[:n_noise]
+    rows = []
+    for _ in range(n_rows):
+        cells = [
+            make_cell(
+                rng,
+                delimiter,
+                quotechar,
+                escapechar,
+                quote_prob,
+                escape_prob,
+                noise,
+            )
+            for _ in range(n_cols)
+        ]
+        rows.append(delimiter.join(cells))
+    return "\r\n".join(rows) + "\r\n"
+
+
+def generate_config(name, seed=42):
+    """ Return the text and the dialect of a named configuration """
+    n_rows, n_cols, delim, quote, escape, q_prob, e_prob, n_noise = CONFIGS[
+        name
+    ]
+    text = generate_csv(
+        n_rows,
+        n_cols,
+        delimiter=delim,
+        quotechar=quote,
+        escapechar=escape,
+        quote_prob=q_prob,
+        escape_prob=e_prob,
+        n_noise=n_noise,
+        seed=seed,
+    )
+    return text, Dialect(delim, quote, escape)
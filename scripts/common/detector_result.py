@@ -16,8 +16,35 @@ import json
 import socket
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from .dialect import Dialect
 
+# string encoder used by json.dumps
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+# orjson is only used for decoding, because its encoding differs from that of
+# json.dumps and the output files should not change.
+def _json_loads(line):
+    """ Decode a json line, with orjson if available
+
+    orjson rejects the NaN and Infinity values that json.dumps writes, so
+    those lines are decoded with json.
+
+    >>> _json_loads('{"runtime": NaN}')
+    {'runtime': nan}
+    """
+    if orjson is None:
+        return json.loads(line)
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return json.loads(line)
+
 
 class Status(enum.Enum):
     UNKNOWN = 0
@@ -36,9 +63,73 @@ class StatusMsg(enum.Enum):
     NO_DIALECTS = 6
     HUMAN_SKIP = 7
     AMBIGUOUS_QUOTECHAR = 8
+    MEMORY_EXCEEDED = 9
+    DEADLINE_REACHED = 10
+
+
+# Lookup tables for converting the enums from and to JSON
+STATUS_NAMES = {s: s.name for s in Status}
+STATUS_BY_NAME = {s.name: s for s in Status}
+STATUS_MSG_NAMES = {s: s.name for s in StatusMsg}
+STATUS_MSG_BY_NAME = {s.name: s for s in StatusMsg}
+
+
+_HOSTNAME = None
+
+
+def get_hostname():
+    """ Hostname of this machine, resolved once per process """
+    global _HOSTNAME
+    if _HOSTNAME is None:
+        _HOSTNAME = socket.gethostname()
+    return _HOSTNAME
+
+
+def _encode_value(x):
+    """ Encode a string or other value the way json.dumps does
+
+    >>> [_encode_value(x) for x in [None, "a", 3]]
+    ['null', '"a"', '3']
+    """
+    if isinstance(x, str):
+        return _encode_str(x)
+    return json.dumps(x)
+
+
+def _encode_number(x):
+    """ Encode a number the way json.dumps does
+
+    >>> [_encode_number(x) for x in [None, 600, 1.5, float("nan")]]
+    ['null', '600', '1.5', 'NaN']
+    """
+    if x is None:
+        return "null"
+    if isinstance(x, float):
+        if x != x:
+            return "NaN"
+        elif x == float("inf"):
+            return "Infinity"
+        elif x == -float("inf"):
+            return "-Infinity"
+        return float.__repr__(x)
+    return json.dumps(x)
 
 
 class DetectorResult(object):
+
+    __slots__ = (
+        "detector",
+        "dialect",
+        "filename",
+        "hostname",
+        "runtime",
+        "status",
+        "status_msg",
+        "original_detector",
+        "note",
+        "stats",
+    )
+
     def __init__(
         self,
         detector=None,
@@ -49,17 +140,19 @@ class DetectorResult(object):
         status=None,
         status_msg=None,
         original_detector=None,
-        note=None
+        note=None,
+        stats=None,
     ):
         self.detector = detector
         self.dialect = dialect
         self.filename = filename
-        self.hostname = hostname or socket.gethostname()
+        self.hostname = hostname or get_hostname()
         self.runtime = runtime
         self.status = status
         self.status_msg = status_msg
         self.original_detector = original_detector or detector
         self.note = note
+        self.stats = stats
 
     def validate(self):
         assert isinstance(self.status, Status)
@@ -79,30 +172,62 @@ class DetectorResult(object):
         else:
             assert self.dialect is None
 
-    def to_json(self):
-        self.validate()
-        output = {
-            "detector": self.detector,
-            "filename": self.filename,
-            "hostname": self.hostname,
-            "runtime": self.runtime,
-            "status": self.status.name,
-        }
+    def to_json(self, validate=True):
+        """
+        Convert the result to a JSON string. Validation of the result can be 
+        skipped for results that are known to be valid.
+        """
+        if validate:
+            self.validate()
+        # This writes the same output as json.dumps would for the dict 
+        # {"detector": ..., "filename": ..., ...}, but is faster.
+        parts = [
+            '{"detector": ',
+            _encode_str(self.detector),
+            ', "filename": ',
+            _encode_str(self.filename),
+            ', "hostname": ',
+            _encode_str(self.hostname),
+            ', "runtime": ',
+            _encode_number(self.runtime),
+            ', "status": "',
+            STATUS_NAMES[self.status],
+            '"',
+        ]
         if not self.dialect is None:
-            output["dialect"] = self.dialect.to_dict()
+            parts.extend(
+                [
+                    ', "dialect": {"delimiter": ',
+                    _encode_str(self.dialect.delimiter),
+                    ', "quotechar": ',
+                    _encode_str(self.dialect.quotechar),
+                    ', "escapechar": ',
+                    _encode_str(self.dialect.escapechar),
+                    "}",
+                ]
+            )
         if not self.status_msg is None:
-            output["status_msg"] = self.status_msg.name
+            parts.extend(
+                [', "status_msg": "', STATUS_MSG_NAMES[self.status_msg], '"']
+            )
         if not self.note is None:
-            output['note'] = self.note
+            parts.extend([', "note": ', _encode_value(self.note)])
         if not self.detector == self.original_detector:
-            output["original_detector"] = self.original_detector
-        as_json = json.dumps(output)
-        return as_json
+            parts.extend(
+                [
+                    ', "original_detector": ',
+                    _encode_value(self.original_detector),
+                ]
+            )
+        if not self.stats is None:
+            parts.extend([', "stats": ', json.dumps(self.stats)])
+        parts.append("}")
+        return "".join(parts)
 
     @classmethod
-    def from_json(cls, line):
-        """ load from a json line """
-        d = json.loads(line)
+    def from_json(cls, line, validate=True):
+        """ load from a json line, optionally without validating the result """
+        d = _json_loads(line)
         try:
             d["dialect"] = (
                 Dialect.from_dict(d["dialect"]) if "dialect" in d else None
@@ -111,12 +236,13 @@ class DetectorResult(object):
             print("Error occurred parsing dialect from line: %s" % line, 
                     file=sys.stderr)
             raise
-        d["status"] = Status[d["status"]]
+        d["status"] = STATUS_BY_NAME[d["status"]]
         d["status_msg"] = (
-            StatusMsg[d["status_msg"]] if "status_msg" in d else None
+            STATUS_MSG_BY_NAME[d["status_msg"]] if "status_msg" in d else None
         )
         dr = cls(**d)
-        dr.validate()
+        if validate:
+            dr.validate()
         return dr
 
     def __repr__(self):
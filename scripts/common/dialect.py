@@ -20,10 +20,43 @@ ATTRIBUTES = ["delimiter", "quotechar", "escapechar"]
 
 @total_ordering
 class Dialect(object):
-    def __init__(self, delimiter, quotechar, escapechar):
-        self.delimiter = delimiter
-        self.quotechar = quotechar
-        self.escapechar = escapechar
+    """
+    A dialect is defined by its delimiter, quotechar, and escapechar.
+
+    Dialects are immutable and interned: creating a dialect that equals an 
+    existing one returns the existing instance. Since the number of distinct 
+    dialects is small compared to the number of results that refer to them, 
+    this saves a lot of memory when many results are loaded.
+
+    >>> Dialect(",", '"', "") is Dialect(",", '"', "")
+    True
+    >>> import pickle
+    >>> pickle.loads(pickle.dumps(Dialect(";", "", ""))) is Dialect(";", "", "")
+    True
+    """
+
+    __slots__ = ("delimiter", "quotechar", "escapechar", "_key", "_hash")
+
+    _instances = {}
+
+    def __new__(cls, delimiter, quotechar, escapechar):
+        key = (delimiter, quotechar, escapechar)
+        self = cls._instances.get(key, None)
+        if self is None:
+            self = object.__new__(cls)
+            object.__setattr__(self, "delimiter", delimiter)
+            object.__setattr__(self, "quotechar", quotechar)
+            object.__setattr__(self, "escapechar", escapechar)
+            object.__setattr__(self, "_key", key)
+            object.__setattr__(self, "_hash", hash(key))
+            cls._instances[key] = self
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Dialect objects are immutable")
+
+    def __reduce__(self):
+        return (self.__class__, self._key)
 
     def validate(self):
         if self.delimiter is None or len(self.delimiter) > 1:
@@ -65,18 +98,17 @@ class Dialect(object):
             self.escapechar,
         )
 
-    def __key(self):
-        return (self.delimiter, self.quotechar, self.escapechar)
-
     def __hash__(self):
-        return hash(self.__key())
+        return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, Dialect):
             return False
-        return self.__key() == other.__key()
+        return self._key == other._key
 
     def __lt__(self, other):
         if not isinstance(other, Dialect):
             return -1
-        return self.__key() < other.__key()
+        return self._key < other._key
@@ -22,3 +22,33 @@ def is_potential_escapechar(char, encoding):
             return False
         return True
     return False
+
+
+def get_escape_candidates(data, encoding, targets):
+    """
+    Find the potential escape characters that directly precede each of the 
+    target characters (delimiters and quote characters) in the data.
+
+    ``is_potential_escapechar`` is only evaluated for the distinct characters 
+    that directly precede a target, and the data is searched for every pair 
+    of such a character and a target. The result maps every target to a set 
+    of escape characters.
+
+    >>> res = get_escape_candidates('a/,b,"c/"', 'utf-8', [',', '"', ''])
+    >>> sorted(res.items())
+    [('', set()), ('"', {'/'}), (',', {'/'})]
+    """
+    candidates = {t: set() for t in targets}
+    search = [t for t in candidates if t]
+    if not search:
+        return candidates
+
+    for u in set(data):
+        # letters, digits and whitespace are never escape characters
+        if u.isalnum() or u.isspace():
+            continue
+        followed = [v for v in search if u + v in data]
+        if followed and is_potential_escapechar(u, encoding):
+            for v in followed:
+                candidates[v].add(u)
+    return candidates
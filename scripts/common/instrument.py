@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in instrumentation of the detectors.
+
+When enabled, the time spent in the stages of a detector and counters such as
+the number of dialects considered are collected per file, and stored in the
+``stats`` field of the DetectorResult. When disabled (the default), ``stage``
+returns a shared context manager that does nothing and ``count`` returns
+immediately, so the instrumented code runs at practically the same speed.
+
+>>> enable()
+>>> with stage("scoring"):
+...     count("n_dialects", 3)
+>>> stats = collect()
+>>> stats["counters"]
+{'n_dialects': 3}
+>>> list(stats["timings"].keys())
+['scoring']
+>>> disable()
+>>> collect() is None
+True
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import time
+
+_stats = None
+
+
+def _new_stats():
+    return {"timings": {}, "counters": {}}
+
+
+class _Stage(object):
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        elapsed = time.perf_counter() - self.start
+        if not _stats is None:
+            timings = _stats["timings"]
+            timings[self.name] = timings.get(self.name, 0) + elapsed
+
+
+class _NullStage(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def enable():
+    global _stats
+    _stats = _new_stats()
+
+
+def disable():
+    global _stats
+    _stats = None
+
+
+def is_enabled():
+    return not _stats is None
+
+
+def stage(name):
+    """ Context manager that adds the time spent in it to the stage """
+    if _stats is None:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def count(name, n=1):
+    if _stats is None:
+        return
+    counters = _stats["counters"]
+    counters[name] = counters.get(name, 0) + n
+
+
+def merge(stats):
+    """ Add statistics collected elsewhere, such as in a worker process
+
+    >>> enable()
+    >>> count("n_dialects")
+    >>> merge({"timings": {"scoring": 1.5}, "counters": {"n_dialects": 2}})
+    >>> collect()
+    {'timings': {'scoring': 1.5}, 'counters': {'n_dialects': 3}}
+    >>> disable()
+    """
+    if _stats is None or stats is None:
+        return
+    for key in ("timings", "counters"):
+        target = _stats[key]
+        for name, value in stats[key].items():
+            target[name] = target.get(name, 0) + value
+
+
+def collect():
+    """
+    Return the statistics collected since the last call and start over, or
+    None when instrumentation is disabled.
+    """
+    global _stats
+    if _stats is None:
+        return None
+    stats = _stats
+    _stats = _new_stats()
+    return stats
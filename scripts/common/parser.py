@@ -11,6 +11,8 @@ Date: 2018-10-22
 
 """
 
+import hashlib
+
 
 def parse_file(
     S, dialect=None, delimiter=None, quotechar=None, escapechar=None
@@ -157,6 +159,29 @@ def parse_file(
     *inside* the preceding quoted block. This seems counterintuitive and 
     incorrect and thus this behavior has not been duplicated.
 
+    """
+    return list(
+        iter_rows(
+            S,
+            dialect=dialect,
+            delimiter=delimiter,
+            quotechar=quotechar,
+            escapechar=escapechar,
+        )
+    )
+
+
+def iter_rows(
+    S, dialect=None, delimiter=None, quotechar=None, escapechar=None
+):
+    """
+    Parse a CSV file given as a string by ``S`` and yield the rows one by one.
+
+    This is the generator behind ``parse_file``, which can be used when the 
+    rows need not be kept in memory all at once.
+
+    >>> list(iter_rows('a,b\\r\\nc,"d,e"', delimiter=',', quotechar='"'))
+    [['a', 'b'], ['c', 'd,e']]
     """
     if not dialect is None:
         delimiter = dialect.delimiter if delimiter is None else delimiter
@@ -167,7 +192,6 @@ def parse_file(
 
     in_quotes = False
     in_escape = False
-    rows = []
     i = 0
     row = []
     field = ""
@@ -223,7 +247,7 @@ def parse_file(
             end_field = False
 
         if end_row:
-            rows.append(row)
+            yield row
             row = []
             end_row = False
 
@@ -237,6 +261,39 @@ def parse_file(
         s = ""
     if not s in ["\r", "\n", None]:
         row.append(field)
-        rows.append(row)
+        yield row
+
 
-    return rows
+def parse_fingerprint(
+    S, dialect=None, delimiter=None, quotechar=None, escapechar=None
+):
+    """
+    Compute a fingerprint of the parsing result of a CSV file without keeping 
+    the parsed rows in memory.
+
+    The fingerprint is a tuple of the number of rows and a hash of the cell 
+    boundaries and contents. Equal parsing results always have the same 
+    fingerprint, so two dialects can only give the same parsing result if 
+    their fingerprints are equal.
+
+    >>> fp1 = parse_fingerprint('A,"B",C', delimiter=',', quotechar='"')
+    >>> fp2 = parse_fingerprint('A,"B",C', delimiter=',', quotechar='')
+    >>> fp1[0], fp2[0], fp1 == fp2
+    (1, 1, False)
+    >>> fp1 == parse_fingerprint('A,B,C', delimiter=',', quotechar='')
+    True
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    n_rows = 0
+    for row in iter_rows(
+        S,
+        dialect=dialect,
+        delimiter=delimiter,
+        quotechar=quotechar,
+        escapechar=escapechar,
+    ):
+        # the repr of the row is unambiguous in both cell contents and cell
+        # boundaries.
+        hasher.update(repr(row).encode("utf-8"))
+        n_rows += 1
+    return n_rows, hasher.hexdigest()
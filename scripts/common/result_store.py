@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Columnar storage of detector results.
+
+The detectors write their results as JSON lines, which is slow to load for
+large result files as every line has to be decoded and validated. This module
+stores the same results as a NumPy structured array (saved as a ``.npy``
+file), with the filename, detector, dialect, status and runtime as typed
+columns. Results that are written to the columnar format are validated first,
+so they can be loaded without validating every record again.
+
+Missing values are encoded as follows: a runtime of None is stored as NaN, a
+status message of None as -1, and the presence of the dialect, the note, and
+the stats is recorded in the ``has_dialect``, ``has_note``, and ``has_stats``
+columns. The stats are stored as JSON strings.
+
+Conversion between the JSON lines format and the columnar format can be done
+with the ``main`` function below, in which case the format is determined from
+the extension of the files.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import argparse
+import json
+import math
+
+import numpy as np
+
+from .detector_result import DetectorResult, Status, StatusMsg
+from .dialect import Dialect
+
+COLUMNAR_EXTENSION = ".npy"
+
+STRING_FIELDS = [
+    "filename",
+    "detector",
+    "original_detector",
+    "hostname",
+    "note",
+    "stats",
+]
+
+
+def is_columnar(filename):
+    return filename.endswith(COLUMNAR_EXTENSION)
+
+
+def _str_width(values):
+    return max([1] + [len(v) for v in values])
+
+
+def results_to_array(results):
+    """ Convert a list of DetectorResult objects to a structured array """
+    for res in results:
+        res.validate()
+
+    strings = {
+        "filename": [r.filename for r in results],
+        "detector": [r.detector for r in results],
+        # original_detector is None for results that were created without a
+        # detector name, reading these from JSON gives the detector name.
+        "original_detector": [
+            r.original_detector or r.detector for r in results
+        ],
+        "hostname": [r.hostname for r in results],
+        "note": ["" if r.note is None else r.note for r in results],
+        "stats": [
+            "" if r.stats is None else json.dumps(r.stats) for r in results
+        ],
+    }
+    dtype = [(f, "U%i" % _str_width(strings[f])) for f in STRING_FIELDS]
+    dtype += [
+        ("has_note", "?"),
+        ("has_stats", "?"),
+        ("has_dialect", "?"),
+        ("delimiter", "U1"),
+        ("quotechar", "U1"),
+        ("escapechar", "U1"),
+        ("status", "i1"),
+        ("status_msg", "i1"),
+        ("runtime", "f8"),
+    ]
+
+    arr = np.zeros(len(results), dtype=dtype)
+    for field in STRING_FIELDS:
+        arr[field] = strings[field]
+    arr["has_note"] = [not r.note is None for r in results]
+    arr["has_stats"] = [not r.stats is None for r in results]
+    arr["has_dialect"] = [not r.dialect is None for r in results]
+    for attr in ["delimiter", "quotechar", "escapechar"]:
+        arr[attr] = [
+            "" if r.dialect is None else getattr(r.dialect, attr)
+            for r in results
+        ]
+    arr["status"] = [r.status.value for r in results]
+    arr["status_msg"] = [
+        -1 if r.status_msg is None else r.status_msg.value for r in results
+    ]
+    arr["runtime"] = [
+        float("nan") if r.runtime is None else r.runtime for r in results
+    ]
+    return arr
+
+
+def array_to_results(arr):
+    """ Convert a structured array back to a list of DetectorResult objects """
+    # tolist() gives Python objects for all columns in one go, which is much
+    # faster than indexing the array per record.
+    columns = {name: arr[name].tolist() for name in arr.dtype.names}
+    # files written before the stats were added don't have them
+    has_stats = columns.get("has_stats", [False] * len(arr))
+    results = []
+    for i in range(len(arr)):
+        dialect = None
+        if columns["has_dialect"][i]:
+            dialect = Dialect(
+                columns["delimiter"][i],
+                columns["quotechar"][i],
+                columns["escapechar"][i],
+            )
+        runtime = columns["runtime"][i]
+        status_msg = columns["status_msg"][i]
+        res = DetectorResult(
+            detector=columns["detector"][i],
+            dialect=dialect,
+            filename=columns["filename"][i],
+            hostname=columns["hostname"][i],
+            runtime=None if math.isnan(runtime) else runtime,
+            status=Status(columns["status"][i]),
+            status_msg=None if status_msg < 0 else StatusMsg(status_msg),
+            original_detector=columns["original_detector"][i],
+            note=columns["note"][i] if columns["has_note"][i] else None,
+            stats=json.loads(columns["stats"][i]) if has_stats[i] else None,
+        )
+        results.append(res)
+    return results
+
+
+def write_columnar(filename, results):
+    # using a file object stops numpy from changing the extension
+    with open(filename, "wb") as fid:
+        np.save(fid, results_to_array(results), allow_pickle=False)
+
+
+def read_columnar(filename):
+    return array_to_results(np.load(filename, allow_pickle=False))
+
+
+def write_jsonl(filename, results):
+    with open(filename, "w") as fid:
+        for res in results:
+            fid.write(res.to_json() + "\n")
+
+
+def read_jsonl(filename, validate=True):
+    with open(filename, "r") as fid:
+        return [
+            DetectorResult.from_json(line.strip(), validate=validate)
+            for line in fid
+        ]
+
+
+def load_results(filename, validate=True):
+    """
+    Load a list of results from a JSON lines or columnar file. Results in the 
+    columnar format are validated when they are written.
+    """
+    if is_columnar(filename):
+        return read_columnar(filename)
+    return read_jsonl(filename, validate=validate)
+
+
+def save_results(filename, results):
+    """ Save a list of results to a JSON lines or columnar file """
+    if is_columnar(filename):
+        write_columnar(filename, results)
+    else:
+        write_jsonl(filename, results)
+
+
+def convert(input_file, output_file):
+    save_results(output_file, load_results(input_file))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert detector results between the JSON lines and "
+        "the columnar (%s) format" % COLUMNAR_EXTENSION
+    )
+    parser.add_argument("input_file", help="Input result file")
+    parser.add_argument("output_file", help="Output result file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    convert(args.input_file, args.output_file)
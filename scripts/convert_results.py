@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Wrapper around the conversion of detector result files between the JSON lines 
+and the columnar format.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+from common import result_store
+
+if __name__ == "__main__":
+    result_store.main()
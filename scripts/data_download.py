@@ -15,16 +15,26 @@ import argparse
 import hashlib
 import json
 import os
-import random
 import requests
 import shutil
 import sys
 import tempfile
+import threading
 import time
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+BLOCKSIZE = 65536
+
+# Status codes for which the request is retried
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+_thread_data = threading.local()
+
 
 def md5sum(filename):
-    blocksize = 65536
+    blocksize = BLOCKSIZE
     hasher = hashlib.md5()
     with open(filename, "rb") as fid:
         buf = fid.read(blocksize)
@@ -34,32 +44,109 @@ def md5sum(filename):
     return hasher.hexdigest()
 
 
-def download_url(urls, md5old, output_dir):
-    response = None
-    for url in urls:
-        # TODO: Catch error when URL no longer exists
-        try:
-            response = requests.get(url)
-            break
-        except requests.exceptions.ConnectionError:
-            print(
-                "Connection error occurred trying to get url: %s" % url,
-                file=sys.stderr,
-            )
-            continue
-        except requests.exceptions.ChunkedEncodingError:
-            print("Connection error occurred trying to get url: %s" % url,
-                    file=sys.stderr)
-            continue
-    if response is None or response.status_code != 200:
-        return None
+def get_session():
+    """ Session of the current thread, such that connections are reused """
+    if not hasattr(_thread_data, "session"):
+        _thread_data.session = requests.Session()
+    return _thread_data.session
+
+
+class HostLimiter(object):
+    """ Limit the number of simultaneous downloads from a single host """
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def get(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if not host in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(
+                    self.max_per_host
+                )
+            return self.semaphores[host]
 
+
+class RetryableError(Exception):
+    pass
+
+
+def fetch_url(url, fid, timeout=None):
+    """
+    Stream the contents of the url to the file object and return the MD5 
+    checksum of the contents, or None if the url can't be downloaded.
+    """
+    try:
+        with get_session().get(url, stream=True, timeout=timeout) as response:
+            if response.status_code in RETRY_STATUS:
+                raise RetryableError(
+                    "Status code %i" % response.status_code
+                )
+            if response.status_code != 200:
+                return None
+            hasher = hashlib.md5()
+            for chunk in response.iter_content(chunk_size=BLOCKSIZE):
+                hasher.update(chunk)
+                fid.write(chunk)
+            return hasher.hexdigest()
+    except (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.ChunkedEncodingError,
+        requests.exceptions.Timeout,
+    ) as err:
+        raise RetryableError(str(err))
+
+
+def download_url(
+    urls, md5old, output_dir, limiter=None, retries=3, backoff=1.0, 
+    timeout=60
+):
+    """
+    Download the file from the first url that works. Connection errors and 
+    server errors are retried with exponential backoff, before moving on to 
+    the next url.
+    """
+    md5new = None
     tmpfd, tmpfname = tempfile.mkstemp()
-    tmpfid = os.fdopen(tmpfd, "wb")
-    tmpfid.write(response.content)
-    tmpfid.close()
+    try:
+        with os.fdopen(tmpfd, "wb") as tmpfid:
+            for url in urls:
+                semaphore = None if limiter is None else limiter.get(url)
+                for attempt in range(retries + 1):
+                    if attempt > 0:
+                        time.sleep(backoff * 2 ** (attempt - 1))
+                    tmpfid.seek(0)
+                    tmpfid.truncate()
+                    try:
+                        if semaphore is None:
+                            md5new = fetch_url(url, tmpfid, timeout=timeout)
+                        else:
+                            with semaphore:
+                                md5new = fetch_url(
+                                    url, tmpfid, timeout=timeout
+                                )
+                        break
+                    except RetryableError as err:
+                        print(
+                            "Connection error occurred trying to get url: %s "
+                            "(%s)" % (url, err),
+                            file=sys.stderr,
+                        )
+                else:
+                    # all attempts failed, try the next url
+                    continue
+                break
+    except:
+        # errors that aren't retried, such as an invalid url
+        os.unlink(tmpfname)
+        raise
+
+    if md5new is None:
+        os.unlink(tmpfname)
+        return None
 
-    md5new = md5sum(tmpfname)
     if not md5new == md5old:
         print(
             "Checksum mismatch for URL '%s'. Skipping this file." % url,
@@ -72,6 +159,61 @@ def download_url(urls, md5old, output_dir):
     return target
 
 
+def download_all(
+    url_and_hash, output_dir, n_jobs=8, max_per_host=2, retries=3, 
+    backoff=1.0
+):
+    limiter = HostLimiter(max_per_host)
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        futures = [
+            executor.submit(
+                download_url,
+                obj["urls"],
+                obj["md5"],
+                output_dir,
+                limiter=limiter,
+                retries=retries,
+                backoff=backoff,
+            )
+            for obj in url_and_hash
+        ]
+        for future in as_completed(futures):
+            target = future.result()
+            if target is None:
+                continue
+            print("Downloaded file '%s'" % target)
+
+
+def get_existing(output_dir, checksums, verify=False, n_jobs=8):
+    """
+    Return the checksums of the given set that are already in the output 
+    directory, based on the filename. With verify, only files whose contents 
+    match their name are included, and the checksums are computed in 
+    parallel.
+    """
+    have = {}
+    for f in os.listdir(output_dir):
+        h = os.path.splitext(f)[0]
+        if h in checksums:
+            have[h] = os.path.join(output_dir, f)
+    if not verify:
+        return set(have.keys())
+
+    verified = set()
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        md5s = executor.map(md5sum, have.values())
+        for h, md5 in zip(have.keys(), md5s):
+            if h == md5:
+                verified.add(h)
+            else:
+                print(
+                    "Checksum mismatch for existing file '%s', downloading "
+                    "it again." % have[h],
+                    file=sys.stderr,
+                )
+    return verified
+
+
 def parse_args():
     parser = argparse.ArgumentParser("Data Downloader")
     parser.add_argument(
@@ -83,39 +225,59 @@ def parse_args():
     parser.add_argument(
         "-o", "--output", help="output directory", required=True
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of simultaneous downloads",
+        type=int,
+        default=8,
+    )
+    parser.add_argument(
+        "--per-host",
+        help="maximum number of simultaneous downloads from one host",
+        type=int,
+        default=2,
+    )
+    parser.add_argument(
+        "--retries",
+        help="number of retries per url after a connection or server error",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--verify",
+        help="verify the checksums of existing files (in parallel)",
+        action="store_true",
+    )
     return parser.parse_args()
 
 
 def main():
     args = parse_args()
 
-    # load the input file
-    url_and_hash = []
+    # load the input file, keyed by checksum
+    manifest = {}
     with open(args.input, "r") as fid:
         for line in fid:
             obj = json.loads(line.strip())
-            url_and_hash.append(obj)
+            manifest[obj["md5"]] = obj
 
-    # Remove files that already exist
-    have_obj = []
-    have_files = os.listdir(args.output)
-    for f in have_files:
-        h = os.path.splitext(f)[0]
-        obj = next((x for x in url_and_hash if x["md5"] == h), None)
-        if obj is None:
-            # ignore files not in our list
-            continue
-        have_obj.append(obj)
-    for obj in have_obj:
-        url_and_hash.remove(obj)
+    # Remove files that already exist (files not in our list are ignored)
+    checksums = set(manifest.keys())
+    have = get_existing(
+        args.output, checksums, verify=args.verify, n_jobs=args.jobs
+    )
+    todo = checksums - have
+    url_and_hash = [obj for h, obj in manifest.items() if h in todo]
 
     # start the download
-    for obj in url_and_hash:
-        target = download_url(obj["urls"], obj["md5"], args.output)
-        if target is None:
-            continue
-        print("Downloaded file '%s'" % target)
-        time.sleep(random.random())
+    download_all(
+        url_and_hash,
+        args.output,
+        n_jobs=args.jobs,
+        max_per_host=args.per_host,
+        retries=args.retries,
+    )
 
 
 if __name__ == "__main__":
@@ -11,11 +11,49 @@ Date: 2018-10-30
 
 """
 
-from common.parser import parse_file
+from itertools import zip_longest
+
+from common.instrument import count
+from common.parser import iter_rows, parse_fingerprint
 from common.utils import pairwise
 
 
-def break_ties_two(data, A, B):
+def fingerprint_cached(data, dialect, cache=None):
+    """
+    Compute the fingerprint of the parsing result for the given dialect, 
+    reusing an earlier result for the same dialect if it is available in the 
+    cache.
+
+    The tie breaking functions below compare the parsing results of the same 
+    dialects several times, so ``break_ties`` keeps a per-file cache that maps 
+    a dialect to the fingerprint of its parsing result.
+    """
+    if cache is None:
+        return parse_fingerprint(data, dialect=dialect)
+    if dialect in cache:
+        count("fingerprint_cache_hits")
+    else:
+        cache[dialect] = parse_fingerprint(data, dialect=dialect)
+    return cache[dialect]
+
+
+def same_parse(data, A, B, cache=None):
+    """
+    Check whether dialects A and B give the same parsing result.
+
+    The rows are only compared (one at a time) when the fingerprints of both 
+    parsing results are equal.
+    """
+    if fingerprint_cached(data, A, cache=cache) != fingerprint_cached(
+        data, B, cache=cache
+    ):
+        return False
+    X = iter_rows(data, dialect=A)
+    Y = iter_rows(data, dialect=B)
+    return all(x == y for x, y in zip_longest(X, Y))
+
+
+def break_ties_two(data, A, B, cache=None):
     """
     Break ties between dialects A and B.
 
@@ -25,10 +63,7 @@ def break_ties_two(data, A, B):
             d_no = A if A.quotechar == "" else B
             d_yes = B if d_no == A else A
 
-            X = parse_file(data, dialect=d_no)
-            Y = parse_file(data, dialect=d_yes)
-
-            if X == Y:
+            if same_parse(data, d_no, d_yes, cache=cache):
                 # quotechar has no effect
                 return d_no
             else:
@@ -50,25 +85,22 @@ def break_ties_two(data, A, B):
     elif A.delimiter == B.delimiter and A.quotechar == B.quotechar:
         Dnone, Descape = (A, B) if A.escapechar == "" else (B, A)
 
-        X = parse_file(data, Dnone)
-        Y = parse_file(data, Descape)
+        X = iter_rows(data, dialect=Dnone)
+        Y = iter_rows(data, dialect=Descape)
 
         # double check shape. Usually if the shape differs the pattern score
         # should have caught it, but if by a freakish occurance it hasn't then
         # we can't break this tie (for now)
-        if len(X) != len(Y):
-            return None
-        for x, y in zip(X, Y):
-            if len(x) != len(y):
-                return None
-
-        cells_escaped = []
         cells_unescaped = []
-        for x, y in zip(X, Y):
+        for x, y in zip_longest(X, Y):
+            if x is None or y is None or len(x) != len(y):
+                return None
+            if cells_unescaped:
+                continue
             for u, v in zip(x, y):
                 if u != v:
                     cells_unescaped.append(u)
-                    cells_escaped.append(v)
+                    break
 
         # We will break the ties in the following ways:
         #
@@ -77,22 +109,23 @@ def break_ties_two(data, A, B):
         # and the escaped version is the correct dialect. Note that if an odd
         # number of escaped quotechars would occur, then the shape of the file
         # will be different if it is ignored. Only if it occurs an even number
-        # of times within the cell can we get the same shape.
+        # of times within the cell can we get the same shape. Currently the
+        # decision is made on the first offending cell.
         for u in cells_unescaped:
-            count = 0
+            n_same = 0
             for a, b in pairwise(u):
                 if a != Descape.escapechar:
                     continue
                 if a == Descape.escapechar and b == Descape.quotechar:
-                    count += 1
-            if count > 0 and count % 2 == 0:
+                    n_same += 1
+            if n_same > 0 and n_same % 2 == 0:
                 return Descape
             else:
                 return Dnone
     return None
 
 
-def break_ties_three(data, A, B, C):
+def break_ties_three(data, A, B, C, cache=None):
     # NOTE: We have only observed one tie for each case during development, so
     # this may need to be improved in the future.
     equal_delim = A.delimiter == B.delimiter == C.delimiter
@@ -113,17 +146,17 @@ def break_ties_three(data, A, B, C):
         if any((d is None for d in [d_none, d_single, d_double])):
             return None
 
-        r_none = parse_file(data, d_none)
-        r_single = parse_file(data, d_single)
-        r_double = parse_file(data, d_double)
+        n_none = fingerprint_cached(data, d_none, cache=cache)[0]
+        n_single = fingerprint_cached(data, d_single, cache=cache)[0]
+        n_double = fingerprint_cached(data, d_double, cache=cache)[0]
 
-        if len(r_none) != len(r_single) or len(r_none) != len(r_double):
+        if n_none != n_single or n_none != n_double:
             return None
 
-        if r_none == r_single:
-            return break_ties_two(data, d_none, d_double)
-        elif r_none == r_double:
-            return break_ties_two(data, d_none, d_single)
+        if same_parse(data, d_none, d_single, cache=cache):
+            return break_ties_two(data, d_none, d_double, cache=cache)
+        elif same_parse(data, d_none, d_double, cache=cache):
+            return break_ties_two(data, d_none, d_single, cache=cache)
     elif equal_delim:
         # difference is in quotechar *and* escapechar
 
@@ -141,12 +174,14 @@ def break_ties_three(data, A, B, C):
         if len(with_quote) != 2:
             return None
 
-        return break_ties_two(data, with_quote[0], with_quote[1])
+        return break_ties_two(
+            data, with_quote[0], with_quote[1], cache=cache
+        )
 
     return None
 
 
-def break_ties_four(data, dialects):
+def break_ties_four(data, dialects, cache=None):
     # NOTE: We have only observed one case during development where this
     # function was needed. It may need to be revisited in the future if other
     # examples are found.
@@ -158,16 +193,14 @@ def break_ties_four(data, dialects):
     # First, identify dialects that result in the same parsing result.
     equal_dialects = []
     for a, b in pairwise(dialects):
-        X = parse_file(data, a)
-        Y = parse_file(data, b)
-        if X == Y:
+        if same_parse(data, a, b, cache=cache):
             equal_dialects.append((a, b))
 
     # Try to break the ties in these pairs
     new_dialects = set()
     visited = set()
     for A, B in equal_dialects:
-        ans = break_ties_two(data, A, B)
+        ans = break_ties_two(data, A, B, cache=cache)
         if not ans is None:
             new_dialects.add(ans)
         visited.add(A)
@@ -180,18 +213,22 @@ def break_ties_four(data, dialects):
 
     # Defer to other functions if the number of dialects was reduced
     if len(dialects) == 2:
-        return break_ties_two(data, *dialects)
+        return break_ties_two(data, *dialects, cache=cache)
     elif len(dialects) == 3:
-        return break_ties_three(data, *dialects)
+        return break_ties_three(data, *dialects, cache=cache)
 
     return None
 
 
 def break_ties(data, dialects):
+    # fingerprints are shared between all the comparisons for this file
+    cache = {}
     if len(dialects) == 2:
-        return break_ties_two(data, dialects[0], dialects[1])
+        return break_ties_two(data, dialects[0], dialects[1], cache=cache)
     elif len(dialects) == 3:
-        return break_ties_three(data, dialects[0], dialects[1], dialects[2])
+        return break_ties_three(
+            data, dialects[0], dialects[1], dialects[2], cache=cache
+        )
     elif len(dialects) == 4:
-        return break_ties_four(data, dialects)
+        return break_ties_four(data, dialects, cache=cache)
     return None
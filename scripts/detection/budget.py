@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Time and memory budget for the detectors.
+
+With a budget, the files are analyzed in a separate worker process. The worker
+is killed (together with any processes it started) when a file takes longer
+than the time budget, and the memory budget is enforced by limiting the
+address space of the worker with ``RLIMIT_AS``. Files that exceed the budget
+fail with status message TIMEOUT or MEMORY_EXCEEDED, so that a single file
+can't stall the detection or run the whole machine out of memory. A new worker
+is started for the next file.
+
+The worker is reused for all other files, such that modules, compiled regular
+expressions and other caches are only loaded once. Note that the memory limit
+applies to the virtual memory of the worker, which is an upper bound on the
+resident memory, so the limit shouldn't be set too tight. The worker is
+started with fork, so the detectors don't need to be picklable.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import multiprocessing
+import os
+import resource
+import signal
+import sys
+import traceback
+
+from multiprocessing import resource_tracker
+from common import instrument
+from common.detector_result import DetectorResult, Status, StatusMsg
+
+_CONTEXT = multiprocessing.get_context("fork")
+
+# messages from the worker
+_RESULT = "result"
+_MEMORY = "memory"
+_ERROR = "error"
+_TIMEOUT = "timeout"
+
+# Signals that kill the worker when an allocation fails outside of Python code
+# under RLIMIT_AS: an abort (e.g. a fatal error of the interpreter or an
+# uncaught std::bad_alloc) or a segfault on the NULL returned by malloc.
+_MEMORY_SIGNALS = (signal.SIGABRT, signal.SIGSEGV, signal.SIGBUS)
+
+
+def _budget_worker(determine_dqr, max_memory, conn):
+    # new process group, such that processes started by the detector can be
+    # killed along with the worker
+    os.setpgrp()
+    if not max_memory is None:
+        limit = int(max_memory * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    while True:
+        try:
+            filename, verbose = conn.recv()
+        except EOFError:
+            break
+        try:
+            res = determine_dqr(filename, verbose=verbose)
+            res.stats = instrument.collect()
+            message = (_RESULT, res)
+        except MemoryError:
+            message = (_MEMORY, None)
+        except Exception:
+            message = (_ERROR, traceback.format_exc())
+        conn.send(message)
+        if message[0] == _MEMORY:
+            # start with a clean heap for the next file
+            break
+    conn.close()
+
+
+class BudgetWorker(object):
+    """ Run a detector in a worker process within a time and memory budget
+
+    The timeout is in seconds and the memory limit in megabytes, either can be
+    None for no limit. Exceptions raised by the detector are raised by
+    ``determine_dqr`` as a RuntimeError.
+    """
+
+    def __init__(self, determine_dqr, timeout=None, max_memory=None):
+        self._determine_dqr = determine_dqr
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.proc = None
+        self.conn = None
+
+    def start(self):
+        # The resource tracker removes shared memory that is left behind by
+        # killed workers, so it must not be in the process group of the worker
+        resource_tracker.ensure_running()
+        self.conn, child_conn = _CONTEXT.Pipe()
+        self.proc = _CONTEXT.Process(
+            target=_budget_worker,
+            args=(self._determine_dqr, self.max_memory, child_conn),
+        )
+        self.proc.start()
+        child_conn.close()
+
+    def stop(self):
+        if self.proc is None:
+            return
+        self.conn.close()
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.join()
+        self.proc = None
+        self.conn = None
+
+    def _receive(self, filename, verbose):
+        """ Send the file to the worker and wait for the reply """
+        self.conn.send((filename, verbose))
+        if not self.conn.poll(self.timeout):
+            return _TIMEOUT, None
+        try:
+            return self.conn.recv()
+        except EOFError:
+            # the worker died without a reply
+            return None, None
+
+    def _memory_signal(self, exitcode):
+        """ Whether the worker was killed by a failed allocation """
+        if self.max_memory is None or exitcode is None or exitcode >= 0:
+            return False
+        return -exitcode in _MEMORY_SIGNALS
+
+    def determine_dqr(self, filename, verbose=False):
+        if self.proc is None or not self.proc.is_alive():
+            self.stop()
+            self.start()
+
+        try:
+            kind, value = self._receive(filename, verbose)
+        except BrokenPipeError:
+            kind, value = None, None
+
+        if kind == _RESULT:
+            return value
+        if kind == _ERROR:
+            raise RuntimeError(
+                "Exception in worker for file %s:\n%s" % (filename, value)
+            )
+
+        proc = self.proc
+        self.stop()
+        if kind == _TIMEOUT:
+            status_msg = StatusMsg.TIMEOUT
+        elif kind == _MEMORY or self._memory_signal(proc.exitcode):
+            status_msg = StatusMsg.MEMORY_EXCEEDED
+        else:
+            print(
+                "Worker exited with code %r on file: %s"
+                % (proc.exitcode, filename),
+                file=sys.stderr,
+            )
+            status_msg = StatusMsg.UNKNOWN
+        return DetectorResult(status=Status.FAIL, status_msg=status_msg)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache of detection results, keyed by the content of the CSV file.
+
+The files in our corpora are named by their MD5 checksum, and the same file
+contents are often analyzed many times. The cache stores the DetectorResult
+for the MD5 checksum of the file contents, the detector name, and the version
+of the detection code, such that a change in the code invalidates the cached
+results.
+
+Results that depend on a time or memory budget (a timeout, exceeded memory
+or a reached deadline) are not stored, because a run without these limits
+would give a different result.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import glob
+import hashlib
+import os
+import sqlite3
+
+from common.detector_result import DetectorResult, StatusMsg
+
+CODE_DIRS = [
+    "common",
+    "detection",
+    os.path.join("detection", "lib", "types"),
+    os.path.join("detection", "lib", "hypoparsr", "R"),
+]
+
+# the R sources are included for HypoParsr
+CODE_PATTERNS = ["*.py", "*.R"]
+
+_CODE_VERSION = None
+
+# status messages of results that depend on the limits of the run
+BOUNDED_STATUS_MSGS = set(
+    [
+        StatusMsg.TIMEOUT,
+        StatusMsg.MEMORY_EXCEEDED,
+        StatusMsg.DEADLINE_REACHED,
+    ]
+)
+
+
+def md5sum(filename):
+    blocksize = 65536
+    hasher = hashlib.md5()
+    with open(filename, "rb") as fid:
+        buf = fid.read(blocksize)
+        while len(buf) > 0:
+            hasher.update(buf)
+            buf = fid.read(blocksize)
+    return hasher.hexdigest()
+
+
+def get_code_version():
+    """ Checksum of the source files that the detectors depend on """
+    global _CODE_VERSION
+    if _CODE_VERSION is None:
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        hasher = hashlib.md5()
+        for code_dir in CODE_DIRS:
+            filenames = []
+            for pattern in CODE_PATTERNS:
+                filenames.extend(
+                    glob.glob(os.path.join(base_dir, code_dir, pattern))
+                )
+            for filename in sorted(filenames):
+                hasher.update(os.path.relpath(filename, base_dir).encode())
+                with open(filename, "rb") as fid:
+                    hasher.update(fid.read())
+        _CODE_VERSION = hasher.hexdigest()
+    return _CODE_VERSION
+
+
+class ResultCache(object):
+    def __init__(self, cache_file, version=None):
+        self.version = get_code_version() if version is None else version
+        # a generous timeout as multiple detectors may share the cache
+        self.conn = sqlite3.connect(cache_file, timeout=60)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "content_hash TEXT NOT NULL, "
+            "detector TEXT NOT NULL, "
+            "version TEXT NOT NULL, "
+            "result TEXT NOT NULL, "
+            "PRIMARY KEY (content_hash, detector, version))"
+        )
+        self.conn.commit()
+
+    def get(self, content_hash, detector):
+        """ Return the cached result or None if there is none """
+        row = self.conn.execute(
+            "SELECT result FROM results WHERE content_hash = ? AND "
+            "detector = ? AND version = ?",
+            (content_hash, detector, self.version),
+        ).fetchone()
+        if row is None:
+            return None
+        # results are validated before they are stored
+        return DetectorResult.from_json(row[0], validate=False)
+
+    def put(self, content_hash, detector, res):
+        """ Store the result, unless it depends on the limits of the run """
+        if res.status_msg in BOUNDED_STATUS_MSGS:
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            (content_hash, detector, self.version, res.to_json()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -14,12 +14,23 @@ import json
 import time
 import argparse
 import codecs
+import functools
 import unicodedata
 
 from tqdm import tqdm
 
+from common import instrument
 from common.detector_result import DetectorResult, Status, StatusMsg
 
+from .budget import BudgetWorker
+from .cache import ResultCache, md5sum
+from .profiling import (
+    PROFILE_MODES,
+    PROFILE_THRESHOLD,
+    get_profiler,
+    save_profile,
+)
+
 
 def can_be_delim_unicode(char, encoding=None):
     as_unicode = codecs.decode(bytes(char, encoding), encoding=encoding)
@@ -85,12 +96,31 @@ def main(
     detector=None,
     verbose=False,
     progress=False,
+    cache_file=None,
+    columnar_file=None,
+    stats=False,
+    profile=None,
+    profile_threshold=PROFILE_THRESHOLD,
+    timeout=None,
+    max_memory=None,
 ):
+    if not (profile is None or (timeout is None and max_memory is None)):
+        # the files would be analyzed in the worker, outside the profiler
+        raise ValueError("Profiling can't be combined with a budget")
+
     with open(path_file, "r") as fid:
         files = [l.strip() for l in fid.readlines()]
     files.sort()
 
     previous = load_previous(output_file)
+    cache = None if cache_file is None else ResultCache(cache_file)
+    if stats:
+        instrument.enable()
+    worker = None
+    if not (timeout is None and max_memory is None):
+        worker = BudgetWorker(
+            determine_dqr, timeout=timeout, max_memory=max_memory
+        )
 
     for filename in tqdm(files, disable=not progress, desc=detector):
         if filename in previous:
@@ -108,25 +138,80 @@ def main(
             dump_result(output_file, res)
             continue
 
+        if not cache is None:
+            content_hash = md5sum(filename)
+            res = cache.get(content_hash, detector)
+            if not res is None:
+                # the runtime of the cached result is kept
+                res.filename = filename
+                dump_result(output_file, res)
+                continue
+
         if not progress:
             print("[%s] Analyzing file: %s" % (detector, filename))
 
+        # discard anything collected outside determine_dqr
+        instrument.collect()
+        profiler = None
+        if not profile is None:
+            profiler = get_profiler(profile)
+            profiler.enable()
         start_time = time.time()
         try:
-            res = determine_dqr(filename, verbose=verbose)
+            if not worker is None:
+                res = worker.determine_dqr(filename, verbose=verbose)
+            else:
+                res = determine_dqr(filename, verbose=verbose)
         except KeyboardInterrupt:
+            if not worker is None:
+                worker.stop()
             raise
         except:
             print("Uncaught exception occured parsing file: %s" % filename)
+            if not worker is None:
+                worker.stop()
             raise
+        finally:
+            if not profiler is None:
+                profiler.disable()
 
-        res.runtime = time.time() - start_time
+        runtime = time.time() - start_time
+        if res.runtime is None:
+            # detectors that run an external program may report its runtime
+            res.runtime = runtime
+        if not profiler is None and runtime >= profile_threshold:
+            profile_file = save_profile(
+                profiler, output_file, filename, profile
+            )
+            print(
+                "[%s] Saved profile of %s to %s"
+                % (detector, filename, profile_file)
+            )
+        if res.stats is None:
+            # with a budget the stats are collected by the worker
+            res.stats = instrument.collect()
         res.filename = filename
         res.detector = detector
         dump_result(output_file, res)
 
+        if not cache is None:
+            cache.put(content_hash, detector, res)
+
+    if not worker is None:
+        worker.stop()
+    if not cache is None:
+        cache.close()
+    if stats:
+        instrument.disable()
+
+    if not columnar_file is None:
+        # imported here because numpy adds a lot to the startup time
+        from common.result_store import convert
+
+        convert(output_file, columnar_file)
 
-def parse_args():
+
+def parse_args(options=()):
     parser = argparse.ArgumentParser()
     parser.add_argument("-v", "--verbose", dest="verbose", action="store_true")
     parser.add_argument(
@@ -142,11 +227,113 @@ def parse_args():
         default=None,
         nargs="?",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--cache",
+        dest="cache_file",
+        help="SQLite file to cache results by file contents and code version",
+        default=None,
+    )
+    parser.add_argument(
+        "--columnar",
+        dest="columnar_file",
+        help="Also write all results in the output file to this columnar "
+        "(.npy) file when done",
+        default=None,
+    )
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        help="Record the time spent in each stage and other counters",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        help="Profile every file and save the profile of files that take "
+        "longer than the profile threshold",
+        choices=sorted(PROFILE_MODES.keys()),
+        default=None,
+    )
+    parser.add_argument(
+        "--profile-threshold",
+        dest="profile_threshold",
+        help="Minimal runtime in seconds for a profile to be saved "
+        "(default: %(default)s)",
+        type=float,
+        default=PROFILE_THRESHOLD,
+    )
+    parser.add_argument(
+        "--timeout",
+        dest="timeout",
+        help="Time budget per file in seconds. Files are analyzed in a "
+        "separate process when a budget is set",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "--max-memory",
+        dest="max_memory",
+        help="Memory budget per file in megabytes (limits the virtual memory "
+        "of the worker process)",
+        type=float,
+        default=None,
+    )
+    if "time_limit" in options:
+        parser.add_argument(
+            "--time-limit",
+            dest="time_limit",
+            help="Stop the search for the dialect after this many seconds "
+            "and return the best dialect found so far. Loading the file, the "
+            "pattern score of a dialect and breaking ties are not "
+            "interrupted, so the runtime can exceed the limit",
+            type=float,
+            default=None,
+        )
+    jobs = parser
+    if "chunk_jobs" in options and "dialect_jobs" in options:
+        # a file is either split in chunks or its dialects are split
+        jobs = parser.add_mutually_exclusive_group()
+    if "chunk_jobs" in options:
+        jobs.add_argument(
+            "--chunk-jobs",
+            dest="chunk_jobs",
+            help="Number of processes that score a single file by splitting "
+            "it in chunks",
+            type=int,
+            default=None,
+        )
+    if "dialect_jobs" in options:
+        jobs.add_argument(
+            "--dialect-jobs",
+            dest="dialect_jobs",
+            help="Number of processes that score the dialects of a file in "
+            "parallel",
+            type=int,
+            default=None,
+        )
+    args = parser.parse_args()
+    if not (
+        args.profile is None
+        or (args.timeout is None and args.max_memory is None)
+    ):
+        parser.error(
+            "--profile can't be combined with --timeout or --max-memory"
+        )
+    return args
+
 
+def run(determine_dqr, detector, options=()):
+    """Run the detector from the command line
 
-def run(determine_dqr, detector):
-    args = parse_args()
+    The options are the names of the keyword arguments of determine_dqr that
+    the detector supports, out of: time_limit, chunk_jobs and dialect_jobs.
+    Command line options are only added for these.
+    """
+    args = parse_args(options=options)
+    for option in options:
+        value = getattr(args, option)
+        if not value is None:
+            determine_dqr = functools.partial(determine_dqr, **{option: value})
     if args.output_file is None:
         print(determine_dqr(args.input_file, verbose=args.verbose))
     else:
@@ -157,4 +344,11 @@ def run(determine_dqr, detector):
             detector=detector,
             verbose=args.verbose,
             progress=args.progress,
+            cache_file=args.cache_file,
+            columnar_file=args.columnar_file,
+            stats=args.stats,
+            profile=args.profile,
+            profile_threshold=args.profile_threshold,
+            timeout=args.timeout,
+            max_memory=args.max_memory,
         )
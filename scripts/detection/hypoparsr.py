@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Runner for HypoParsr that keeps a single R process alive for all files.
+
+Starting Rscript and loading hypoparsr takes a long time, so the R worker in
+``hypo_worker.R`` loads it once and then reads the files to analyze from its
+stdin. R can't interrupt the C code in hypoparsr, so a file that takes too long
+is stopped by killing the worker. A new worker is started for the next file.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from .core import run
+
+from common.detector_result import DetectorResult, Status, StatusMsg
+
+DETECTOR = "hypoparsr"
+TIMEOUT = 600  # ten minutes
+
+HYPO_WORKER = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "hypo_worker.R"
+)
+READY_LINE = "HYPO_READY"
+RESULT_PREFIX = "HYPO_RESULT "
+
+
+class HypoWorker(object):
+    def __init__(self, timeout=TIMEOUT, command=None):
+        self.timeout = timeout
+        self.command = ["Rscript", HYPO_WORKER] if command is None else command
+        self.proc = None
+        self.lines = None
+
+    def _read_output(self, proc, lines):
+        for line in proc.stdout:
+            lines.put(line.rstrip("\n"))
+        # signal that the worker has exited
+        lines.put(None)
+
+    def _next_result(self, deadline=None):
+        """ Wait for the next result line until the deadline """
+        while True:
+            timeout = None
+            if not deadline is None:
+                timeout = max(0, deadline - time.time())
+            try:
+                line = self.lines.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            if line is None:
+                raise RuntimeError("HypoParsr worker exited unexpectedly")
+            if line.endswith(READY_LINE):
+                return READY_LINE
+            # output of hypoparsr without a newline ends up before the prefix
+            pos = line.find(RESULT_PREFIX)
+            if pos >= 0:
+                return line[pos:]
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            bufsize=1,
+        )
+        self.lines = queue.Queue()
+        reader = threading.Thread(
+            target=self._read_output, args=(self.proc, self.lines)
+        )
+        reader.daemon = True
+        reader.start()
+        # loading hypoparsr doesn't count towards the timeout
+        if not self._next_result() == READY_LINE:
+            raise RuntimeError("HypoParsr worker failed to start")
+
+    def stop(self):
+        if self.proc is None:
+            return
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        self.proc = None
+        self.lines = None
+
+    def determine_dqr(self, filename, verbose=False):
+        if self.proc is None or not self.proc.poll() is None:
+            self.stop()
+            self.start()
+
+        # starting the worker doesn't count towards the runtime
+        start_time = time.time()
+        deadline = start_time + self.timeout
+        try:
+            self.proc.stdin.write(filename + "\n")
+            self.proc.stdin.flush()
+            line = self._next_result(deadline=deadline)
+        except (BrokenPipeError, RuntimeError):
+            print(
+                "HypoParsr worker crashed on file: %s" % filename,
+                file=sys.stderr,
+            )
+            self.stop()
+            return DetectorResult(
+                runtime=time.time() - start_time,
+                status=Status.FAIL,
+                status_msg=StatusMsg.UNKNOWN,
+            )
+
+        if line is None:
+            # the worker is killed and restarted for the next file
+            self.stop()
+            return DetectorResult(
+                runtime=self.timeout,
+                status=Status.FAIL,
+                status_msg=StatusMsg.TIMEOUT,
+            )
+        # the runtime is the one measured in R
+        return DetectorResult.from_json(line[len(RESULT_PREFIX) :])
+
+
+def main():
+    worker = HypoWorker()
+    try:
+        run(determine_dqr=worker.determine_dqr, detector=DETECTOR)
+    finally:
+        worker.stop()
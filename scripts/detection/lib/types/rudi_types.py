@@ -100,38 +100,42 @@ SPECIALS_ALLOWED = [
     chr(125278),  # adlam initial exclamation mark
 ]
 
-PATTERNS = {
-    "number_1": regex.compile(
-        "(?=[+-\.\d])[+-]?(?:0|[1-9]\d*)?(((?P<dot>\.)?(?(dot)(?P<yes_dot>\d*(\d+[eE][+-]?\d+)?)|(?P<no_dot>([eE][+-]?\d+)?)))|((?P<comma>,)?(?(comma)(?P<yes_comma>\d+(\d+[eE][+-]?\d+)?)|(?P<no_comma>([eE][+-]?\d+)?))))"
-    ),
-    "number_2": regex.compile("[+-]?(?:[1-9]|[1-9]\d{0,2})(?:\,\d{3})+\.\d*"),
-    "number_3": regex.compile("[+-]?(?:[1-9]|[1-9]\d{0,2})(?:\.\d{3})+\,\d*"),
-    "url": regex.compile(
-        "(?:(?:[A-Za-z]{3,9}:(?:\/\/)?)(?:[-;:&=\+\$,\w]+@)?[A-Za-z0-9.-]+|(?:www.|[-;:&=\+\$,\w]+@)[A-Za-z0-9.-]+)(?:(?:\/[\+~%\/.\w\-_]*)?\??(?:[-\+=&;%@.\w_]*)#?(?:[\w]*))?"
-    ),
-    "email": regex.compile(
-        r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)"
-    ),
-    "unicode_alphanum": regex.compile(
+# The patterns are compiled on first use by get_pattern, because compiling all 
+# of them takes a large part of the startup time of the detectors.
+PATTERN_SOURCES = {
+    "number_1": "(?=[+-\.\d])[+-]?(?:0|[1-9]\d*)?(((?P<dot>\.)?(?(dot)(?P<yes_dot>\d*(\d+[eE][+-]?\d+)?)|(?P<no_dot>([eE][+-]?\d+)?)))|((?P<comma>,)?(?(comma)(?P<yes_comma>\d+(\d+[eE][+-]?\d+)?)|(?P<no_comma>([eE][+-]?\d+)?))))",
+    "number_2": "[+-]?(?:[1-9]|[1-9]\d{0,2})(?:\,\d{3})+\.\d*",
+    "number_3": "[+-]?(?:[1-9]|[1-9]\d{0,2})(?:\.\d{3})+\,\d*",
+    "url": "(?:(?:[A-Za-z]{3,9}:(?:\/\/)?)(?:[-;:&=\+\$,\w]+@)?[A-Za-z0-9.-]+|(?:www.|[-;:&=\+\$,\w]+@)[A-Za-z0-9.-]+)(?:(?:\/[\+~%\/.\w\-_]*)?\??(?:[-\+=&;%@.\w_]*)#?(?:[\w]*))?",
+    "email": r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)",
+    "unicode_alphanum": (
         "(\p{N}+\p{L}+[\p{N}\p{L}\ "
         + regex.escape("".join(SPECIALS_ALLOWED))
         + "]*|\p{L}+[\p{N}\p{L}\ "
         + regex.escape("".join(SPECIALS_ALLOWED))
         + "]+)"
     ),
-    "time_hhmmss": regex.compile(
-        "(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9]):([0-5][0-9])"
-    ),
-    "time_hhmm": regex.compile("(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])"),
-    "time_HHMM": regex.compile("(0[0-9]|1[0-9]|2[0-3])([0-5][0-9])"),
-    "time_HH": regex.compile("(0[0-9]|1[0-9]|2[0-3])([0-5][0-9])"),
-    "time_hmm": regex.compile("([0-9]|1[0-9]|2[0-3]):([0-5][0-9])"),
-    "currency": regex.compile("\p{Sc}\s?(.*)"),
-    "unix_path": regex.compile(
-        "[\/~]{1,2}(?:[a-zA-Z0-9\.]+(?:[\/]{1,2}))+(?:[a-zA-Z0-9\.]+)"
-    ),
+    "time_hhmmss": "(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9]):([0-5][0-9])",
+    "time_hhmm": "(0[0-9]|1[0-9]|2[0-3]):([0-5][0-9])",
+    "time_HHMM": "(0[0-9]|1[0-9]|2[0-3])([0-5][0-9])",
+    "time_HH": "(0[0-9]|1[0-9]|2[0-3])([0-5][0-9])",
+    "time_hmm": "([0-9]|1[0-9]|2[0-3]):([0-5][0-9])",
+    "currency": "\p{Sc}\s?(.*)",
+    "unix_path": "[\/~]{1,2}(?:[a-zA-Z0-9\.]+(?:[\/]{1,2}))+(?:[a-zA-Z0-9\.]+)",
 }
 
+DATE_PATTERNS = []
+
+PATTERNS = {}
+
+
+def get_pattern(patname):
+    """ Get the compiled pattern, compiling it if this is the first use """
+    pat = PATTERNS.get(patname, None)
+    if pat is None:
+        pat = PATTERNS[patname] = regex.compile(PATTERN_SOURCES[patname])
+    return pat
+
 
 def load_date_patterns():
     year2 = "(?:\d{2})"
@@ -159,7 +163,8 @@ def load_date_patterns():
                 pat_ko = "{year}년{month}월{day}일".format(**fmt)
 
                 for pattern in [pat_1, pat_2, pat_3, pat_cn, pat_ko]:
-                    PATTERNS["date_%i" % counter] = regex.compile(pattern)
+                    PATTERN_SOURCES["date_%i" % counter] = pattern
+                    DATE_PATTERNS.append("date_%i" % counter)
                     counter += 1
 
     # These should be allowed as dates, but are also numbers.
@@ -175,7 +180,8 @@ def load_date_patterns():
         pat_3 = "{month}{sep}{day}{sep}{year}".format(**fmt)
 
         for pattern in [pat_1, pat_2, pat_3, pat_cn]:
-            PATTERNS["date_%i" % counter] = regex.compile(pattern)
+            PATTERN_SOURCES["date_%i" % counter] = pattern
+            DATE_PATTERNS.append("date_%i" % counter)
             counter += 1
 
 
@@ -189,7 +195,7 @@ def test_with_regex(cell, patname):
     # stripping of leading/trailing spaces)
     if STRIP_WHITESPACE:
         cell = cell.strip()
-    pat = PATTERNS.get(patname, None)
+    pat = get_pattern(patname)
     match = pat.fullmatch(cell)
     return match is not None
 
@@ -225,10 +231,9 @@ def test_date(cell):
     if test_number(cell):
         return False
 
-    for patname in PATTERNS:
-        if patname.startswith("date_"):
-            if test_with_regex(cell, patname):
-                return True
+    for patname in DATE_PATTERNS:
+        if test_with_regex(cell, patname):
+            return True
     return False
 
 
@@ -255,7 +260,7 @@ def test_percentage(cell):
 def test_currency(cell):
     if STRIP_WHITESPACE:
         cell = cell.strip()
-    pat = PATTERNS.get("currency", None)
+    pat = get_pattern("currency")
     m = pat.fullmatch(cell)
     if m is None:
         return False
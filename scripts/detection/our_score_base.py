@@ -13,12 +13,14 @@ License: See the LICENSE file.
 
 import itertools
 import re
+import time
 
 from collections import Counter
 
 from common.dialect import Dialect
 from common.encoding import get_encoding
 from common.escape import is_potential_escapechar
+from common.instrument import count, stage
 from common.load import load_file
 from common.parser import parse_file
 from common.detector_result import DetectorResult, Status, StatusMsg
@@ -31,6 +33,19 @@ from ._ties import break_ties
 
 BLOCKED_DELIMS = [".", "/", '"', "'"]
 
+# Number of cells or characters that are processed between checks of the
+# deadline, which takes a few tens of milliseconds at most
+CHECK_INTERVAL = 1 << 12
+
+
+class DeadlineReached(Exception):
+    pass
+
+
+def check_deadline(deadline):
+    if not deadline is None and time.time() > deadline:
+        raise DeadlineReached
+
 
 def masked_by_quotechar(S, quotechar, escapechar, test_char):
     """Test if a character is always masked by quote characters
@@ -255,12 +270,45 @@ def is_clean(cell):
     return not (eval_types(cell) is None)
 
 
-def get_potential_dialects(data, encoding):
+def get_row_patterns(data, dialect):
+    """Count the row patterns of the abstraction of the data
+
+    >>> get_row_patterns('a,b\\rc,d\\re', Dialect(',', '', ''))
+    Counter({'CDC': 2, 'C': 1})
+    """
+    return Counter(make_abstraction(data, dialect).split("R"))
+
+
+def get_clean_counts(data, dialect, deadline=None):
+    """Return the number of clean cells and the number of cells
+
+    Raises DeadlineReached if the deadline passes while checking the cells.
+
+    >>> get_clean_counts('1,a\\r2,b?!', Dialect(',', '', ''))
+    (3, 4)
+    """
+    if deadline is None:
+        cells = get_cells(data, dialect)
+        return sum((is_clean(cell) for cell in cells)), len(cells)
+    check_deadline(deadline)
+    cells = get_cells(data, dialect)
+    n_clean = 0
+    for i in range(0, len(cells), CHECK_INTERVAL):
+        check_deadline(deadline)
+        block = cells[i : i + CHECK_INTERVAL]
+        n_clean += sum((is_clean(cell) for cell in block))
+    return n_clean, len(cells)
+
+
+def get_potential_dialects(data, encoding, deadline=None):
     """
     We consider as escape characters those characters for which 
     is_potential_escapechar() is True and that occur at least once before a 
     quote character or delimiter in the dialect.
 
+    If the deadline passes, the search for escape characters stops and only 
+    the escape characters found so far are considered.
+
     One may wonder if self-escaping is an issue here (i.e. "\\\\", two times 
     backslash). It is not. In a file where a single backslash is desired and 
     escaping with a backslash is used, then it only makes sense to do this in a 
@@ -275,12 +323,16 @@ def get_potential_dialects(data, encoding):
     for delim, quotechar in itertools.product(delims, quotechars):
         escapechars[(delim, quotechar)] = set([""])
 
-    for u, v in pairwise(data):
-        if not is_potential_escapechar(u, encoding):
-            continue
-        for delim, quotechar in itertools.product(delims, quotechars):
-            if v == delim or v == quotechar:
-                escapechars[(delim, quotechar)].add(u)
+    for start in range(0, len(data), CHECK_INTERVAL):
+        if not deadline is None and time.time() > deadline:
+            break
+        # the blocks overlap by one character, such that every pair is seen
+        for u, v in pairwise(data[start : start + CHECK_INTERVAL + 1]):
+            if not is_potential_escapechar(u, encoding):
+                continue
+            for delim, quotechar in itertools.product(delims, quotechars):
+                if v == delim or v == quotechar:
+                    escapechars[(delim, quotechar)].add(u)
 
     dialects = []
     for delim in delims:
@@ -293,9 +345,61 @@ def get_potential_dialects(data, encoding):
     return dialects
 
 
-def determine_dqr(filename, score_func, verbose=False, do_break_ties=True):
-    encoding = get_encoding(filename)
-    data = load_file(filename, encoding=encoding)
+def order_dialects(data, dialects):
+    """Order the dialects such that the most promising ones come first
+
+    Dialects with a delimiter and quotechar that occur more often in the data
+    come first, and the order is deterministic. Scoring the promising dialects
+    first makes pruning in the score functions more effective and gives a
+    good answer early when the search is stopped at a deadline.
+
+    >>> d1 = Dialect(",", "", "")
+    >>> d2 = Dialect(";", "", "")
+    >>> d3 = Dialect(";", '"', "")
+    >>> order_dialects('a;"b";c,d', [d1, d2, d3]) == [d3, d2, d1]
+    True
+    """
+    counts = {"": 0}
+    for dialect in dialects:
+        for char in (dialect.delimiter, dialect.quotechar):
+            if not char in counts:
+                counts[char] = data.count(char)
+    return sorted(
+        dialects,
+        key=lambda d: (-counts[d.delimiter], -counts[d.quotechar], d),
+    )
+
+
+def iter_dialects(data, dialects, deadline=None):
+    """Iterate over the dialects in order of promise until the deadline
+
+    The deadline is a time.time() value. The score functions also stop if the
+    type scoring of a dialect raises DeadlineReached.
+    """
+    for i, dialect in enumerate(order_dialects(data, dialects)):
+        if not deadline is None and time.time() > deadline:
+            count("dialects_skipped", len(dialects) - i)
+            return
+        yield dialect
+
+
+def determine_dqr(
+    filename, score_func, verbose=False, do_break_ties=True, time_limit=None
+):
+    """Detect the dialect of the file with the given score function
+
+    If a time limit (in seconds) is given, the search for potential dialects
+    and the score function stop when it is reached, and the best dialect found
+    so far is returned with status message DEADLINE_REACHED. If no dialect was
+    scored by then, the most promising dialect according to
+    ``order_dialects`` is returned. Loading the file, computing the pattern
+    score of a dialect and breaking ties are not interrupted.
+    """
+    deadline = None if time_limit is None else time.time() + time_limit
+    with stage("encoding"):
+        encoding = get_encoding(filename)
+    with stage("load"):
+        data = load_file(filename, encoding=encoding)
     if data is None:
         return DetectorResult(
             status=Status.SKIP, status_msg=StatusMsg.UNREADABLE
@@ -303,7 +407,13 @@ def determine_dqr(filename, score_func, verbose=False, do_break_ties=True):
 
     # fix-up to replace urls by a character, this removes many potential
     # delimiters that only occur in urls and cause noise.
-    dialects = get_potential_dialects(filter_urls(data), encoding)
+    with stage("dialects"):
+        dialects = get_potential_dialects(
+            filter_urls(data), encoding, deadline=deadline
+        )
+    count("dialects", len(dialects))
+    # the dialects may be incomplete if the deadline passed
+    partial = not deadline is None and time.time() > deadline
     if not dialects:
         return DetectorResult(
             status=Status.FAIL, status_msg=StatusMsg.NO_DIALECTS
@@ -315,10 +425,21 @@ def determine_dqr(filename, score_func, verbose=False, do_break_ties=True):
             "Considering %i dialects\n" % (len(data), len(dialects))
         )
 
-    scores = score_func(data, dialects, verbose=verbose)
+    with stage("scoring"):
+        scores = score_func(data, dialects, verbose=verbose, deadline=deadline)
+    partial = partial or len(scores) < len(dialects)
+    if not scores:
+        # the deadline was reached before any dialect was scored
+        return DetectorResult(
+            dialect=order_dialects(data, dialects)[0],
+            status=Status.OK,
+            status_msg=StatusMsg.DEADLINE_REACHED,
+        )
 
+    # the scores are sorted by dialect first, such that the order of the
+    # tied dialects doesn't depend on the order of scoring
     score_sort = sorted(
-        [(scores[dialect], dialect) for dialect in scores],
+        [(scores[dialect], dialect) for dialect in sorted(scores)],
         key=lambda x: x[0],
         reverse=True,
     )
@@ -327,8 +448,10 @@ def determine_dqr(filename, score_func, verbose=False, do_break_ties=True):
     dialects_with_score = [x[1] for x in score_sort if x[0] == max_prob]
 
     if len(dialects_with_score) > 1:
+        count("tied_dialects", len(dialects_with_score))
         if do_break_ties:
-            res = break_ties(data, dialects_with_score)
+            with stage("tie_breaking"):
+                res = break_ties(data, dialects_with_score)
         else:
             res = None
     else:
@@ -343,6 +466,7 @@ def determine_dqr(filename, score_func, verbose=False, do_break_ties=True):
             status=Status.FAIL, status_msg=StatusMsg.MULTIPLE_ANSWERS
         )
 
-    res = DetectorResult(dialect=res, status=Status.OK)
+    status_msg = StatusMsg.DEADLINE_REACHED if partial else None
+    res = DetectorResult(dialect=res, status=Status.OK, status_msg=status_msg)
 
     return res
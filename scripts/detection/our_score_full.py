@@ -10,10 +10,29 @@ Copyright (c) 2018 - The Alan Turing Institute
 License: See the LICENSE file.
 """
 
-from collections import Counter
+import functools
+import math
+import time
+
+from common.instrument import count, stage
 
 from .core import run
-from .our_score_base import determine_dqr, get_cells, is_clean, make_abstraction
+from .our_score_base import (
+    DeadlineReached,
+    check_deadline,
+    determine_dqr,
+    get_clean_counts,
+    get_row_patterns,
+    iter_dialects,
+    order_dialects,
+)
+from .parallel import (
+    ChunkPool,
+    DialectPool,
+    get_max_score,
+    get_worker_data,
+    update_max_score,
+)
 
 DETECTOR = "our_score_full"
 
@@ -23,60 +42,162 @@ EPS_PAT = 1e-3
 EPS_TYP = 1e-10
 
 
-def get_scores(data, dialects, verbose=False):
-    scores = {}
-    max_score = -float("inf")
-    for dialect in sorted(dialects):
-        A = make_abstraction(data, dialect)
-        row_patterns = Counter(A.split("R"))
+def score_dialect(data, dialect, max_score, pool=None, deadline=None):
+    """Compute the score of a dialect, unless it can't beat max_score
+
+    Returns the score, the pattern score, the type score and the number of
+    cells that were typed. If a ChunkPool is given, the row patterns and clean
+    cells are counted in parallel by the pool, which gives the same scores.
+    Raises DeadlineReached if the deadline has passed before the scoring or
+    passes during the type scoring.
+    """
+    check_deadline(deadline)
+    with stage("pattern_score"):
+        if pool is None:
+            row_patterns = get_row_patterns(data, dialect)
+        else:
+            row_patterns = pool.row_patterns(dialect)
         pattern_score = 0
         for pat_p, n_p in row_patterns.items():
             Lk = len(pat_p.split("D"))
             pattern_score += n_p * (max(EPS_PAT, Lk - 1) / Lk)
         pattern_score /= len(row_patterns)
 
-        if pattern_score == 0:
-            # if pattern score is zero, the outcome will be zero, so we
-            # don't have to check types.
-            type_score = float("nan")
-            score = 0
-        elif pattern_score < max_score:
-            # since the type score is in [0, 1], if the pattern score
-            # is smaller than the current best score, it can't possibly
-            # be improved by types, so we don't have to bother.
-            type_score = float("nan")
-            score = 0
+    if pattern_score == 0:
+        # if pattern score is zero, the outcome will be zero, so we
+        # don't have to check types.
+        return 0, pattern_score, float("nan"), 0
+    elif pattern_score < max_score:
+        # since the type score is in [0, 1], if the pattern score
+        # is smaller than the current best score, it can't possibly
+        # be improved by types, so we don't have to bother.
+        return 0, pattern_score, float("nan"), 0
+
+    with stage("type_score"):
+        if pool is None:
+            n_clean, n_cells = get_clean_counts(
+                data, dialect, deadline=deadline
+            )
         else:
-            cells = get_cells(data, dialect)
-            n_clean = sum((is_clean(cell) for cell in cells))
-            n_cells = len(cells)
-
-            if n_cells == 0:
-                type_score = EPS_TYP
-            else:
-                type_score = max(EPS_TYP, n_clean / n_cells)
-            score = type_score * pattern_score
-
-        scores[dialect] = score
-        max_score = max(max_score, score)
-
-        if verbose:
-            print(
-                "%15r:\ttype = %.6f\tpattern = %.6f\tfinal = %s"
-                % (
-                    dialect,
-                    type_score,
-                    pattern_score,
-                    "0" if scores[dialect] == 0 else "%.6f" % scores[dialect],
-                )
+            n_clean, n_cells = pool.clean_counts(dialect, deadline=deadline)
+
+    if n_cells == 0:
+        type_score = EPS_TYP
+    else:
+        type_score = max(EPS_TYP, n_clean / n_cells)
+    return type_score * pattern_score, pattern_score, type_score, n_cells
+
+
+def record_score(scores, dialect, result, verbose=False):
+    score, pattern_score, type_score, n_cells = result
+    if math.isnan(type_score):
+        count("dialects_pruned")
+    else:
+        count("cells_typed", n_cells)
+
+    scores[dialect] = score
+
+    if verbose:
+        print(
+            "%15r:\ttype = %.6f\tpattern = %.6f\tfinal = %s"
+            % (
+                dialect,
+                type_score,
+                pattern_score,
+                "0" if scores[dialect] == 0 else "%.6f" % scores[dialect],
+            )
+        )
+
+
+def get_scores(data, dialects, verbose=False, deadline=None, pool=None):
+    scores = {}
+    max_score = -float("inf")
+    for dialect in iter_dialects(data, dialects, deadline=deadline):
+        try:
+            result = score_dialect(
+                data, dialect, max_score, pool=pool, deadline=deadline
             )
+        except DeadlineReached:
+            count("dialects_skipped", len(dialects) - len(scores))
+            break
+        record_score(scores, dialect, result, verbose=verbose)
+        max_score = max(max_score, result[0])
+    return scores
+
 
+def get_scores_chunked(
+    data, dialects, verbose=False, deadline=None, n_jobs=2
+):
+    pool = ChunkPool(data, n_jobs)
+    if pool.n_chunks == 1:
+        # not worth starting the processes for a small file
+        return get_scores(data, dialects, verbose=verbose, deadline=deadline)
+    with pool:
+        return get_scores(
+            data, dialects, verbose=verbose, deadline=deadline, pool=pool
+        )
+
+
+def _score_dialect_task(dialect, deadline=None):
+    result = score_dialect(
+        get_worker_data(), dialect, get_max_score(), deadline=deadline
+    )
+    update_max_score(result[0])
+    return dialect, result
+
+
+def get_scores_per_dialect(
+    data, dialects, verbose=False, deadline=None, n_jobs=2
+):
+    """Compute the scores of the dialects in parallel
+
+    The workers share the best score found so far, such that they can still
+    prune dialects. Which dialects are pruned can differ from ``get_scores``,
+    but the pruned dialects can't have the best score, so the dialects with
+    the best score and their scores are the same.
+    """
+    if len(dialects) < 2:
+        return get_scores(data, dialects, verbose=verbose, deadline=deadline)
+    scores = {}
+    task = functools.partial(_score_dialect_task, deadline=deadline)
+    with DialectPool(data, n_jobs) as pool:
+        results = pool.imap(task, order_dialects(data, dialects))
+        try:
+            for dialect, result in results:
+                record_score(scores, dialect, result, verbose=verbose)
+                if not deadline is None and time.time() > deadline:
+                    break
+        except DeadlineReached:
+            pass
+    if len(scores) < len(dialects):
+        count("dialects_skipped", len(dialects) - len(scores))
     return scores
 
 
-def wrap_determine_dqr(filename, verbose=False):
-    return determine_dqr(filename, get_scores, verbose=verbose)
+def wrap_determine_dqr(
+    filename,
+    verbose=False,
+    time_limit=None,
+    chunk_jobs=None,
+    dialect_jobs=None,
+):
+    if not (chunk_jobs is None or dialect_jobs is None):
+        raise ValueError("Use either chunk_jobs or dialect_jobs, not both")
+    score_func = get_scores
+    if not chunk_jobs is None and chunk_jobs > 1:
+        score_func = functools.partial(get_scores_chunked, n_jobs=chunk_jobs)
+    elif not dialect_jobs is None and dialect_jobs > 1:
+        score_func = functools.partial(
+            get_scores_per_dialect, n_jobs=dialect_jobs
+        )
+    return determine_dqr(
+        filename, score_func, verbose=verbose, time_limit=time_limit
+    )
 
 
 def main():
-    run(determine_dqr=wrap_determine_dqr, detector=DETECTOR)
+    run(
+        determine_dqr=wrap_determine_dqr,
+        detector=DETECTOR,
+        options=["time_limit", "chunk_jobs", "dialect_jobs"],
+    )
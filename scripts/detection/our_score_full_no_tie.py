@@ -14,11 +14,14 @@ License: See the LICENSE file.
 
 from collections import Counter
 
+from common.instrument import count, stage
+
 from .core import run
 from .our_score_base import (
+    DeadlineReached,
     determine_dqr,
-    get_cells,
-    is_clean,
+    get_clean_counts,
+    iter_dialects,
     make_abstraction,
 )
 
@@ -31,33 +34,42 @@ EPS_PAT = 1e-3
 EPS_TYP = 1e-10
 
 
-def get_scores(data, dialects, verbose=False):
+def get_scores(data, dialects, verbose=False, deadline=None):
     scores = {}
     max_score = -float("inf")
-    for dialect in sorted(dialects):
-        A = make_abstraction(data, dialect)
-        row_patterns = Counter(A.split("R"))
-        pattern_score = 0
-        for pat_p, n_p in row_patterns.items():
-            Lk = len(pat_p.split("D"))
-            pattern_score += n_p * (max(EPS_PAT, Lk - 1) / Lk)
-        pattern_score /= len(row_patterns)
+    for dialect in iter_dialects(data, dialects, deadline=deadline):
+        with stage("pattern_score"):
+            A = make_abstraction(data, dialect)
+            row_patterns = Counter(A.split("R"))
+            pattern_score = 0
+            for pat_p, n_p in row_patterns.items():
+                Lk = len(pat_p.split("D"))
+                pattern_score += n_p * (max(EPS_PAT, Lk - 1) / Lk)
+            pattern_score /= len(row_patterns)
 
         if pattern_score == 0:
             # if pattern score is zero, the outcome will be zero, so we
             # don't have to check types.
             type_score = float("nan")
             score = 0
+            count("dialects_pruned")
         elif pattern_score < max_score:
             # since the type score is in [0, 1], if the pattern score
             # is smaller than the current best score, it can't possibly
             # be improved by types, so we don't have to bother.
             type_score = float("nan")
             score = 0
+            count("dialects_pruned")
         else:
-            cells = get_cells(data, dialect)
-            n_clean = sum((is_clean(cell) for cell in cells))
-            n_cells = len(cells)
+            try:
+                with stage("type_score"):
+                    n_clean, n_cells = get_clean_counts(
+                        data, dialect, deadline=deadline
+                    )
+            except DeadlineReached:
+                count("dialects_skipped", len(dialects) - len(scores))
+                break
+            count("cells_typed", n_cells)
 
             if n_cells == 0:
                 type_score = EPS_TYP
@@ -82,11 +94,19 @@ def get_scores(data, dialects, verbose=False):
     return scores
 
 
-def wrap_determine_dqr(filename, verbose=False):
+def wrap_determine_dqr(filename, verbose=False, time_limit=None):
     return determine_dqr(
-        filename, get_scores, verbose=verbose, do_break_ties=False
+        filename,
+        get_scores,
+        verbose=verbose,
+        do_break_ties=False,
+        time_limit=time_limit,
     )
 
 
 def main():
-    run(determine_dqr=wrap_determine_dqr, detector=DETECTOR)
+    run(
+        determine_dqr=wrap_determine_dqr,
+        detector=DETECTOR,
+        options=["time_limit"],
+    )
@@ -13,24 +13,27 @@ License: See the LICENSE file.
 
 from collections import Counter
 
+from common.instrument import stage
+
 from .core import run
-from .our_score_base import determine_dqr, make_abstraction
+from .our_score_base import determine_dqr, iter_dialects, make_abstraction
 from .our_score_full import EPS_PAT
 
 
 DETECTOR = "our_score_pattern_only"
 
 
-def get_scores(data, dialects, verbose=False):
+def get_scores(data, dialects, verbose=False, deadline=None):
     scores = {}
-    for dialect in sorted(dialects):
-        A = make_abstraction(data, dialect)
-        row_patterns = Counter(A.split("R"))
-        pattern_score = 0
-        for pat_p, n_p in row_patterns.items():
-            Lk = len(pat_p.split("D"))
-            pattern_score += n_p * (max(EPS_PAT, Lk - 1) / Lk)
-        pattern_score /= len(row_patterns)
+    for dialect in iter_dialects(data, dialects, deadline=deadline):
+        with stage("pattern_score"):
+            A = make_abstraction(data, dialect)
+            row_patterns = Counter(A.split("R"))
+            pattern_score = 0
+            for pat_p, n_p in row_patterns.items():
+                Lk = len(pat_p.split("D"))
+                pattern_score += n_p * (max(EPS_PAT, Lk - 1) / Lk)
+            pattern_score /= len(row_patterns)
 
         score = pattern_score
         scores[dialect] = score
@@ -48,9 +51,15 @@ def get_scores(data, dialects, verbose=False):
     return scores
 
 
-def wrap_determine_dqr(filename, verbose=False):
-    return determine_dqr(filename, get_scores, verbose=verbose)
+def wrap_determine_dqr(filename, verbose=False, time_limit=None):
+    return determine_dqr(
+        filename, get_scores, verbose=verbose, time_limit=time_limit
+    )
 
 
 def main():
-    run(determine_dqr=wrap_determine_dqr, detector=DETECTOR)
+    run(
+        determine_dqr=wrap_determine_dqr,
+        detector=DETECTOR,
+        options=["time_limit"],
+    )
@@ -10,20 +10,33 @@ Copyright (c) 2018 - The Alan Turing Institute
 License: See the LICENSE file.
 """
 
+from common.instrument import count, stage
+
 from .core import run
-from .our_score_base import determine_dqr, get_cells, is_clean
+from .our_score_base import (
+    DeadlineReached,
+    determine_dqr,
+    get_clean_counts,
+    iter_dialects,
+)
 from .our_score_full import EPS_TYP
 
 
 DETECTOR = "our_score_type_only"
 
 
-def get_scores(data, dialects, verbose=False):
+def get_scores(data, dialects, verbose=False, deadline=None):
     scores = {}
-    for dialect in sorted(dialects):
-        cells = get_cells(data, dialect)
-        n_clean = sum((is_clean(cell) for cell in cells))
-        n_cells = len(cells)
+    for dialect in iter_dialects(data, dialects, deadline=deadline):
+        try:
+            with stage("type_score"):
+                n_clean, n_cells = get_clean_counts(
+                    data, dialect, deadline=deadline
+                )
+        except DeadlineReached:
+            count("dialects_skipped", len(dialects) - len(scores))
+            break
+        count("cells_typed", n_cells)
 
         if n_cells == 0:
             type_score = EPS_TYP
@@ -46,9 +59,15 @@ def get_scores(data, dialects, verbose=False):
     return scores
 
 
-def wrap_determine_dqr(filename, verbose=False):
-    return determine_dqr(filename, get_scores, verbose=verbose)
+def wrap_determine_dqr(filename, verbose=False, time_limit=None):
+    return determine_dqr(
+        filename, get_scores, verbose=verbose, time_limit=time_limit
+    )
 
 
 def main():
-    run(determine_dqr=wrap_determine_dqr, detector=DETECTOR)
+    run(
+        determine_dqr=wrap_determine_dqr,
+        detector=DETECTOR,
+        options=["time_limit"],
+    )
@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Parallel computation of the scores of a single file.
+
+A large file is split into chunks that are processed by a pool of worker
+processes. The row patterns and the number of clean cells of the chunks are
+combined to exactly the counts of the whole file, so the scores are the same
+as those of the sequential code.
+
+For this the file can only be split at positions where the abstraction and the
+parser start over: at the end of a run of newline characters, outside of
+quotes and not after an escape character. These positions depend on the
+quotechar and the escapechar of the dialect, so the cuts are computed for each
+combination of these. Without an escape character, a position is outside
+quotes if the number of quote characters before it is even (double quotes
+count twice), which can be checked quickly with ``str.count``. With an escape
+character, the quote and escape characters are followed one by one.
+
+Dialects can also be scored in parallel with a DialectPool. The workers then
+share the best score found so far, such that dialects that can't beat it are
+still pruned.
+
+When instrumentation is enabled in the parent, it is also enabled in the
+workers. The tasks return the statistics they collected with their results,
+which are merged into those of the parent. The time that the workers of a
+ChunkPool spend on the chunks is recorded in the stages
+``pattern_score_workers`` and ``type_score_workers``, because the stages
+``pattern_score`` and ``type_score`` of the parent already include the time
+spent waiting for the workers. The times of the workers are added up, so they
+can be larger than the time of the ``scoring`` stage.
+
+The text of the file is shared with the workers through shared memory (see
+``shared_text``), so it isn't sent to them, and the workers of a ChunkPool
+only decode the chunks they work on. If a worker dies, the pool raises
+BrokenProcessPool and the shared memory is removed on the way out.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import functools
+import multiprocessing
+import re
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from common import instrument
+
+from .our_score_base import get_clean_counts, get_row_patterns
+from .shared_text import AttachedText, SharedText
+
+# Files are split in this many chunks per process, for load balancing
+CHUNKS_PER_JOB = 4
+
+# Chunks are at least this many characters
+MIN_CHUNK_SIZE = 1 << 16
+
+NEWLINES = re.compile("[\r\n]+")
+
+# text of the file in the worker processes, and the decoded text
+_text = None
+_data = None
+
+# best score found so far, shared by the workers of a DialectPool
+_max_score = None
+
+
+def _init_worker(handle, stats, max_score=None):
+    global _text, _data, _max_score
+    _text = AttachedText(*handle)
+    _data = None
+    _max_score = max_score
+    # a forked worker starts with a copy of the statistics of the parent
+    if stats:
+        instrument.enable()
+    else:
+        instrument.disable()
+
+
+def get_worker_data():
+    """ The text of the file, decoded on first use """
+    global _data
+    if _data is None:
+        _data = _text.text()
+    return _data
+
+
+def get_max_score():
+    return _max_score.value
+
+
+def update_max_score(score):
+    with _max_score.get_lock():
+        if score > _max_score.value:
+            _max_score.value = score
+
+
+def _run_task(func, item):
+    result = func(item)
+    return result, instrument.collect()
+
+
+def _row_patterns_task(args):
+    dialect, start, end = args
+    with instrument.stage("pattern_score_workers"):
+        result = get_row_patterns(_text.slice(start, end), dialect)
+    return result, instrument.collect()
+
+
+def _clean_counts_task(args, deadline=None):
+    dialect, start, end = args
+    with instrument.stage("type_score_workers"):
+        result = get_clean_counts(
+            _text.slice(start, end), dialect, deadline=deadline
+        )
+    return result, instrument.collect()
+
+
+def iter_safe_positions_quotes(data, quotechar):
+    """Positions to split the data at for a dialect without escape character
+
+    >>> list(iter_safe_positions_quotes('a\\r\\nb"c\\nd"\\ne', '"'))
+    [3, 10]
+    >>> list(iter_safe_positions_quotes('a\\n""\\n"b""\\n"\\nc', '"'))
+    [2, 5, 12]
+    """
+    n_quotes = 0
+    counted = 0
+    for match in NEWLINES.finditer(data):
+        pos = match.end()
+        if pos == len(data):
+            return
+        if quotechar:
+            n_quotes += data.count(quotechar, counted, pos)
+            counted = pos
+            if n_quotes % 2:
+                continue
+        yield pos
+
+
+def iter_safe_positions_escape(data, quotechar, escapechar):
+    """Positions to split the data at for a dialect with an escape character
+
+    This follows the state of the quotes and escape characters in the same way
+    as ``make_base_abstraction``, ``merge_with_quotechar`` and ``iter_rows``.
+
+    >>> list(iter_safe_positions_escape('a|\\nb\\n|"\\nc"d\\ne', '"', '|'))
+    [8]
+    >>> list(iter_safe_positions_escape('a\\n|b\\nc', '"', '|'))
+    [5]
+    """
+    special = "[%s]" % re.escape("\r\n" + quotechar + escapechar)
+    n = len(data)
+    in_quotes = False
+    in_escape = False
+    skip = -1
+    prev = 0
+    for match in re.finditer(special, data):
+        i = match.start()
+        if i > prev:
+            # any other character ends the escape
+            in_escape = False
+        prev = i + 1
+        if i == skip:
+            continue
+        s = data[i]
+        if s == quotechar:
+            if in_escape:
+                in_escape = False
+            elif not in_quotes:
+                in_quotes = True
+            elif i + 1 < n and data[i + 1] == quotechar:
+                # a double quote, skip the second one
+                skip = i + 1
+            else:
+                in_quotes = False
+        elif s == escapechar:
+            in_escape = not in_escape
+        elif not (in_quotes or in_escape):
+            # a newline, which doesn't end an escape. The chunk can't start
+            # with the escape character, because the abstraction of a
+            # newline after it depends on the preceding chunk.
+            if i + 1 < n and not data[i + 1] in "\r\n" + escapechar:
+                yield i + 1
+
+
+def find_cuts(data, quotechar, escapechar, n_chunks):
+    """Split the data in about n_chunks chunks of similar size
+
+    Returns the boundaries of the chunks, starting with 0 and ending with the
+    length of the data.
+
+    >>> find_cuts('a,b\\n"c\\nd"\\ne,f\\ng', '"', '', 3)
+    [0, 10, 15]
+    >>> find_cuts('a,b\\nc', '', '', 1)
+    [0, 5]
+    """
+    cuts = [0]
+    if n_chunks > 1:
+        if escapechar:
+            positions = iter_safe_positions_escape(data, quotechar, escapechar)
+        else:
+            positions = iter_safe_positions_quotes(data, quotechar)
+        size = len(data) / n_chunks
+        target = size
+        for pos in positions:
+            if pos < target:
+                continue
+            cuts.append(pos)
+            target = pos + size
+    cuts.append(len(data))
+    return cuts
+
+
+class _SharedTextPool(object):
+    """ Pool of worker processes that share the text of a file """
+
+    def __init__(self, data, n_jobs):
+        self.data = data
+        self.n_jobs = n_jobs
+        self.pool = None
+        self.shared = None
+        self._futures = []
+
+    def _initargs(self):
+        return (self.shared.handle, instrument.is_enabled())
+
+    def __enter__(self):
+        self.shared = SharedText(self.data)
+        try:
+            self.pool = ProcessPoolExecutor(
+                self.n_jobs,
+                initializer=_init_worker,
+                initargs=self._initargs(),
+            )
+        except:
+            self.shared.close()
+            raise
+        return self
+
+    def __exit__(self, *args):
+        # Tasks that didn't start yet are cancelled when the results are no
+        # longer needed. The shared memory is only removed once the workers
+        # are done with it.
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+        self.pool.shutdown(wait=True)
+        self.pool = None
+        self.shared.close()
+
+    def map(self, func, iterable):
+        """Like Executor.map, but the tasks are cancelled on exit of the pool
+
+        The tasks are submitted right away, the results are given in order.
+        """
+        self._futures = [f for f in self._futures if not f.done()]
+        futures = [self.pool.submit(func, item) for item in iterable]
+        self._futures.extend(futures)
+        return (future.result() for future in futures)
+
+
+class ChunkPool(_SharedTextPool):
+    """Pool of processes that compute the counts of a file in chunks
+
+    The methods ``row_patterns`` and ``clean_counts`` give the same output as
+    ``get_row_patterns`` and ``get_clean_counts`` on the whole file.
+    """
+
+    def __init__(self, data, n_jobs, min_chunk_size=MIN_CHUNK_SIZE):
+        super().__init__(data, n_jobs)
+        self.n_chunks = max(
+            1, min(n_jobs * CHUNKS_PER_JOB, len(data) // min_chunk_size)
+        )
+        self._cuts = {}
+
+    def get_tasks(self, dialect):
+        chars = [
+            c
+            for c in (dialect.delimiter, dialect.quotechar, dialect.escapechar)
+            if c
+        ]
+        if len(set(chars)) < len(chars):
+            # the safe positions assume that these characters differ
+            cuts = [0, len(self.data)]
+        else:
+            key = (dialect.quotechar, dialect.escapechar)
+            if not key in self._cuts:
+                self._cuts[key] = find_cuts(
+                    self.data,
+                    dialect.quotechar,
+                    dialect.escapechar,
+                    self.n_chunks,
+                )
+            cuts = self._cuts[key]
+        return [(dialect, start, end) for start, end in zip(cuts, cuts[1:])]
+
+    def row_patterns(self, dialect):
+        row_patterns = Counter()
+        # merging in order of the chunks gives the same order of the patterns
+        for chunk_patterns, stats in self.map(
+            _row_patterns_task, self.get_tasks(dialect)
+        ):
+            row_patterns.update(chunk_patterns)
+            instrument.merge(stats)
+        return row_patterns
+
+    def clean_counts(self, dialect, deadline=None):
+        task = functools.partial(_clean_counts_task, deadline=deadline)
+        n_clean = n_cells = 0
+        for (chunk_clean, chunk_cells), stats in self.map(
+            task, self.get_tasks(dialect)
+        ):
+            n_clean += chunk_clean
+            n_cells += chunk_cells
+            instrument.merge(stats)
+        return n_clean, n_cells
+
+
+class DialectPool(_SharedTextPool):
+    """Pool of processes that score the dialects of a file
+
+    The workers can get the data with ``get_worker_data`` and share the best
+    score with ``get_max_score`` and ``update_max_score``.
+    """
+
+    def _initargs(self):
+        max_score = multiprocessing.Value("d", -float("inf"))
+        return (self.shared.handle, instrument.is_enabled(), max_score)
+
+    def imap(self, func, iterable):
+        """Apply func to the items in the workers, in order of the items
+
+        The statistics that the workers collect in func are merged into those
+        of this process.
+        """
+        task = functools.partial(_run_task, func)
+        for result, stats in self.map(task, iterable):
+            instrument.merge(stats)
+            yield result
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Profiling of slow files in the detectors.
+
+With the ``--profile`` option of the detectors, every file is analyzed under a
+profiler and the profile is saved if the runtime exceeds a threshold. The
+profiles are stored in a directory next to the output file, named after the
+output file, with one profile per input file.
+
+Two profilers are available: the deterministic cProfile profiler, which
+writes ``.prof`` files that can be read with ``pstats``, and a sampling
+profiler with a much lower overhead, which writes the sampled stacks in the
+collapsed stack format (``.collapsed``) used by flame graph tools. The
+sampling profiler uses the SIGPROF signal, so it only works on Unix.
+
+Note that code that runs in a subprocess (such as the Sniffer with its
+timeout) is not included in the profile. For this reason profiling can't be
+combined with a time or memory budget, under which every file is analyzed in a
+worker process.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import cProfile
+import os
+import signal
+
+from collections import Counter
+
+# Minimal runtime (seconds) of a file for its profile to be saved
+PROFILE_THRESHOLD = 5.0
+
+PROFILE_MODES = {"cprofile": ".prof", "sample": ".collapsed"}
+
+
+class SamplingProfiler(object):
+    """ Sample the Python stack at a fixed interval of CPU time """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._old_handler = None
+
+    def _sample(self, signum, frame):
+        stack = []
+        while not frame is None:
+            code = frame.f_code
+            stack.append(
+                "%s:%s:%i"
+                % (
+                    os.path.basename(code.co_filename),
+                    code.co_name,
+                    code.co_firstlineno,
+                )
+            )
+            frame = frame.f_back
+        self.stacks[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        self._old_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def disable(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._old_handler)
+
+    def dump_stats(self, filename):
+        with open(filename, "w") as fid:
+            for stack, n in sorted(self.stacks.items()):
+                fid.write("%s %i\n" % (stack, n))
+
+
+def get_profiler(mode):
+    if mode == "cprofile":
+        return cProfile.Profile()
+    elif mode == "sample":
+        return SamplingProfiler()
+    raise ValueError("Unknown profile mode: %r" % mode)
+
+
+def get_profile_file(output_file, filename, mode):
+    """ Path of the profile for the input file, next to the output file """
+    base = os.path.splitext(output_file)[0]
+    profile_dir = base + "_profiles"
+    name = os.path.basename(filename) + PROFILE_MODES[mode]
+    return os.path.join(profile_dir, name)
+
+
+def save_profile(profiler, output_file, filename, mode):
+    profile_file = get_profile_file(output_file, filename, mode)
+    os.makedirs(os.path.dirname(profile_file), exist_ok=True)
+    profiler.dump_stats(profile_file)
+    return profile_file
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Asyncio interface to the detectors, for use in a service.
+
+The DetectionService accepts the contents of a CSV file as bytes or as a
+stream, and returns the DetectorResult of the detector. The detectors work on
+files, so the data is written to a temporary file in a thread, and the
+detection itself runs in an executor (by default a pool of processes). At
+most ``max_concurrency`` files are handled at once, further calls wait until
+one of them is done, which gives backpressure to the callers.
+
+>>> from concurrent.futures import ThreadPoolExecutor
+>>> async def example():
+...     executor = ThreadPoolExecutor(1)
+...     async with DetectionService("our_score_full", executor=executor) as s:
+...         res = await s.detect_bytes(b"a;b\\r\\n1;2\\r\\n", filename="a.csv")
+...         unnamed = await s.detect_bytes(b"a;b\\r\\n1;2\\r\\n")
+...     executor.shutdown()
+...     return res, unnamed
+>>> res, unnamed = asyncio.run(example())
+>>> res.filename, res.detector, res.dialect
+('a.csv', 'our_score_full', (';', '', ''))
+>>> DetectorResult.from_json(unnamed.to_json()).filename
+'<bytes>'
+
+The detection can't be stopped once it runs, so if a call is cancelled its
+slot in the service and its temporary file are kept until the detector is
+done:
+
+>>> seen = []
+>>> def slow_dqr(filename, verbose=False):
+...     time.sleep(0.3)
+...     seen.append(os.path.exists(filename))
+...     return DetectorResult(status=Status.SKIP)
+>>> async def cancel_example():
+...     executor = ThreadPoolExecutor(2)
+...     async with DetectionService(
+...         "our_score_full", max_concurrency=1, executor=executor
+...     ) as s:
+...         s.determine_dqr = slow_dqr
+...         first = asyncio.ensure_future(s.detect_bytes(b"a,b\\r\\n"))
+...         await asyncio.sleep(0.05)
+...         first.cancel()
+...         start = time.time()
+...         await s.detect_bytes(b"a,b\\r\\n")
+...         waited = time.time() - start
+...     executor.shutdown()
+...     return first.cancelled(), waited > 0.45
+>>> asyncio.run(cancel_example())
+(True, True)
+>>> seen
+[True, True]
+
+The functions ``detect_files`` and ``main`` are a local client of the service,
+which sends files to it as streams. Like the detectors, the client gives a
+FAIL result for files that don't exist:
+
+>>> async def files_example():
+...     executor = ThreadPoolExecutor(1)
+...     async with DetectionService("our_score_full", executor=executor) as s:
+...         results = await detect_files(s, ["/non/existent.csv"])
+...     executor.shutdown()
+...     return results
+>>> [res.status_msg for res in asyncio.run(files_example())]
+[<StatusMsg.NON_EXISTENT: 5>]
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from common.detector_result import DetectorResult, Status, StatusMsg
+
+MAX_CONCURRENCY = 8
+
+# Number of bytes to read from a stream at once
+READ_SIZE = 1 << 16
+
+# Filename of the results of data without a filename
+UNNAMED = "<bytes>"
+
+
+def get_determine_dqr(detector):
+    """ The determine_dqr function of a detector by name """
+    if detector == "hypoparsr":
+        raise ValueError("HypoParsr can't be used in the detection service")
+    try:
+        module = importlib.import_module("detection." + detector)
+    except ImportError:
+        raise ValueError("Unknown detector: %s" % detector)
+    if hasattr(module, "wrap_determine_dqr"):
+        return module.wrap_determine_dqr
+    return module.determine_dqr
+
+
+def _write_temp(tmpfd, data):
+    with os.fdopen(tmpfd, "wb") as fid:
+        fid.write(data)
+
+
+def _detect(determine_dqr, filename):
+    start_time = time.time()
+    res = determine_dqr(filename)
+    res.runtime = time.time() - start_time
+    return res
+
+
+async def finish(future):
+    """Wait for the result of a job in an executor
+
+    A job that runs in an executor can't be stopped. If the waiting is
+    cancelled, this still waits until the job is done before the cancellation
+    is passed on, such that the caller doesn't release the resources of the
+    job (such as its slot in the service or its files) while it runs.
+    """
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.wait([future])
+            except asyncio.CancelledError:
+                pass
+        if not future.cancelled():
+            # the result is no longer needed
+            future.exception()
+        raise
+
+
+async def read_stream(stream):
+    """ Read an asyncio StreamReader or an async iterable of bytes """
+    chunks = []
+    if hasattr(stream, "read"):
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    else:
+        async for chunk in stream:
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class DetectionService(object):
+    """Detect the dialect of uploaded files with a detector
+
+    The detection runs in the given executor, or in a pool of
+    ``max_concurrency`` processes that is created and shut down by the
+    service. Temporary files are written to ``tmpdir``.
+    """
+
+    def __init__(
+        self,
+        detector,
+        max_concurrency=MAX_CONCURRENCY,
+        executor=None,
+        tmpdir=None,
+    ):
+        self.detector = detector
+        self.determine_dqr = get_determine_dqr(detector)
+        self.max_concurrency = max_concurrency
+        self.executor = executor
+        self.tmpdir = tmpdir
+        self._own_executor = executor is None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.max_concurrency)
+        return self
+
+    def _get_semaphore(self):
+        # created on first use, such that it belongs to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._own_executor and not self.executor is None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def detect_bytes(self, data, filename=UNNAMED):
+        async with self._get_semaphore():
+            return await self._detect(data, filename)
+
+    async def detect_stream(self, stream, filename=UNNAMED):
+        """ Detect the dialect of the data from an async stream
+
+        The stream is read while holding a slot of the service, such that
+        uploads are not accepted faster than they are processed.
+        """
+        async with self._get_semaphore():
+            data = await read_stream(stream)
+            return await self._detect(data, filename)
+
+    async def _detect(self, data, filename):
+        loop = asyncio.get_running_loop()
+        tmpfd, tmpfname = tempfile.mkstemp(suffix=".csv", dir=self.tmpdir)
+        try:
+            await finish(loop.run_in_executor(None, _write_temp, tmpfd, data))
+            res = await finish(
+                loop.run_in_executor(
+                    self.executor, _detect, self.determine_dqr, tmpfname
+                )
+            )
+        finally:
+            os.unlink(tmpfname)
+        res.filename = filename
+        res.detector = self.detector
+        return res
+
+
+async def iter_file(filename):
+    """ Read a file in chunks without blocking the event loop """
+    loop = asyncio.get_running_loop()
+    fid = await loop.run_in_executor(None, open, filename, "rb")
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, fid.read, READ_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fid.close()
+
+
+async def detect_file(service, filename):
+    """ Send a file to the service as a stream, failures give a FAIL result """
+    if not os.path.exists(filename):
+        return DetectorResult(
+            detector=service.detector,
+            dialect=None,
+            filename=filename,
+            runtime=None,
+            status=Status.FAIL,
+            status_msg=StatusMsg.NON_EXISTENT,
+        )
+    try:
+        return await service.detect_stream(
+            iter_file(filename), filename=filename
+        )
+    except Exception as err:
+        print(
+            "Error occurred detecting the dialect of file: %s (%r)"
+            % (filename, err),
+            file=sys.stderr,
+        )
+        return DetectorResult(
+            detector=service.detector,
+            dialect=None,
+            filename=filename,
+            runtime=None,
+            status=Status.FAIL,
+            status_msg=StatusMsg.UNKNOWN,
+        )
+
+
+async def detect_files(service, filenames):
+    """ Send the files to the service, results are in order """
+    return await asyncio.gather(
+        *[detect_file(service, filename) for filename in filenames]
+    )
+
+
+async def run_files(detector, filenames, max_concurrency):
+    async with DetectionService(
+        detector, max_concurrency=max_concurrency
+    ) as service:
+        return await detect_files(service, filenames)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run a detector on files through the detection service"
+    )
+    parser.add_argument("detector", help="Name of the detector")
+    parser.add_argument(
+        "input_file", help="File with paths of CSV files, one per line"
+    )
+    parser.add_argument(
+        "output_file",
+        help="Output file (JSON) to write the results to (default: stdout)",
+        default=None,
+        nargs="?",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        help="Maximum number of files handled at once",
+        type=int,
+        default=MAX_CONCURRENCY,
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(args.input_file, "r") as fid:
+        filenames = [l.strip() for l in fid if l.strip()]
+
+    results = asyncio.run(
+        run_files(args.detector, filenames, args.concurrency)
+    )
+    lines = [res.to_json() for res in results]
+    if args.output_file is None:
+        print("\n".join(lines))
+    else:
+        with open(args.output_file, "w") as fid:
+            fid.write("\n".join(lines) + "\n")
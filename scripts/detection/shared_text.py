@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Share the text of a file with worker processes through shared memory.
+
+The text is stored as UTF-32 code points, such that character positions in
+the text are simple offsets in the shared memory. A worker attaches to the
+shared memory by its name and decodes only the part of the text that it
+needs, so the text doesn't have to be sent to every worker.
+
+The process that creates the shared memory owns it and removes it when done.
+The workers of a multiprocessing pool share the resource tracker of this
+process, which removes the shared memory if the owner dies without doing so.
+
+>>> with SharedText("a,b\\r\\nc") as shared:
+...     text = AttachedText(*shared.handle)
+...     part = text.slice(2, 5)
+...     full = text.text()
+...     text.close()
+>>> part
+'b\\r\\n'
+>>> full
+'a,b\\r\\nc'
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+from multiprocessing import shared_memory
+
+ENCODING = "utf-32-le"
+CHAR_SIZE = 4
+
+# Number of characters that are encoded at once when writing the text
+BLOCKSIZE = 1 << 20
+
+
+class SharedText(object):
+    """ Copy a string to shared memory """
+
+    def __init__(self, text):
+        self.length = len(text)
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=max(1, CHAR_SIZE * self.length)
+        )
+        # encoding in blocks avoids a second copy of the whole text
+        for i in range(0, self.length, BLOCKSIZE):
+            encoded = text[i : i + BLOCKSIZE].encode(
+                ENCODING, errors="surrogatepass"
+            )
+            start = CHAR_SIZE * i
+            self.shm.buf[start : start + len(encoded)] = encoded
+
+    @property
+    def handle(self):
+        """ Picklable arguments for AttachedText """
+        return self.shm.name, self.length
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AttachedText(object):
+    """ Access to a SharedText from another process """
+
+    def __init__(self, name, length):
+        self.length = length
+        self.shm = shared_memory.SharedMemory(name=name)
+
+    def slice(self, start, end):
+        """ Decode the characters from start to end """
+        start = max(0, min(start, self.length))
+        end = max(start, min(end, self.length))
+        view = self.shm.buf[CHAR_SIZE * start : CHAR_SIZE * end]
+        try:
+            return str(view, ENCODING, "surrogatepass")
+        finally:
+            view.release()
+
+    def text(self):
+        return self.slice(0, self.length)
+
+    def close(self):
+        self.shm.close()
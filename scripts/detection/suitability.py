@@ -14,11 +14,11 @@ License: See the LICENSE file.
 
 from common.dialect import Dialect
 from common.encoding import get_encoding
-from common.escape import is_potential_escapechar
+from common.escape import get_escape_candidates
+from common.instrument import count, stage
 from common.load import load_file
-from common.parser import parse_file
+from common.parser import iter_rows
 from common.detector_result import DetectorResult, Status, StatusMsg
-from common.utils import pairwise
 
 from .core import run, get_potential_quotechars
 from .lib.types.rudi_types import eval_types
@@ -28,56 +28,7 @@ DETECTOR = "suitability"
 WRANGLER_DELIMS = [",", ":", "|", "\t"]
 
 
-def extract_cells(data, dialect):
-    cells = []
-    rows = parse_file(data, dialect)
-    for row in rows:
-        cells.extend(row)
-    return cells
-
-
-def get_columns(cells):
-    cols = {}
-    for row in cells:
-        for i, c in enumerate(row):
-            if not i in cols:
-                cols[i] = []
-            cols[i].append(c)
-    return cols
-
-
-def count_empties(cells, dialect):
-    count = 0
-    for row in cells:
-        for cell in row:
-            if cell == "":
-                count += 1
-            if not dialect.quotechar is None:
-                if cell == (dialect.quotechar + dialect.quotechar):
-                    count += 1
-    return count
-
-
-def count_delimiters(cells):
-    """Count the cells that contain a delimiter
-
-    It is not entirely trivial whether or not the "continue" statement should 
-    be there, as we could also count each occurrence of a delimiter in a cell 
-    separately. However, since the normalization in the second term of (1) in 
-    Guo et al. (2011) is normalized by |R|*|C| it seems naturally to include 
-    it.
-    """
-    count = 0
-    for row in cells:
-        for cell in row:
-            for d in WRANGLER_DELIMS:
-                if d in cell:
-                    count += 1
-                    continue  # see note
-    return count
-
-
-def column_homogeneity(column):
+def get_cell_type(cell, type_cache=None):
     """
     As the Proactive Wrangler (PW) paper doesn't give sufficient details on all 
     the types they implement, we use our own type inference engine (from 
@@ -85,40 +36,88 @@ def column_homogeneity(column):
     string type as is None. Empty cells are treated separately and are not 
     considered a type in the PW paper.
 
+    The detected types are stored in ``type_cache``, which can be shared 
+    between dialects of the same file.
     """
-    type_counts = {}
-    for cell in column:
-        detected_type = eval_types(cell)
-        if detected_type is None:
-            detected_type = "string"
-        if detected_type == "unicode_alphanum":
-            detected_type = "string"
-        if detected_type == "empty":
-            continue
-        if not detected_type in type_counts:
-            type_counts[detected_type] = 0
-        type_counts[detected_type] += 1
-
-    R = len(column)
-
-    homogeneity = 0
-    for t in type_counts:
-        homogeneity += pow(type_counts[t] / R, 2.0)
-
-    return homogeneity
-
-
-def compute_suitability(data, dialect):
-    cells = extract_cells(data, dialect)
-    columns = get_columns(cells)
-
-    R = len(cells)
-    C = len(columns)
-
-    E = count_empties(cells, dialect)
-    D = count_delimiters(cells)
+    if not type_cache is None and cell in type_cache:
+        return type_cache[cell]
+    detected_type = eval_types(cell)
+    if detected_type is None:
+        detected_type = "string"
+    if detected_type == "unicode_alphanum":
+        detected_type = "string"
+    if not type_cache is None:
+        type_cache[cell] = detected_type
+    return detected_type
+
+
+def compute_suitability(data, dialect, type_cache=None):
+    """Compute the suitability of a dialect in a single pass over the file
+
+    The parsed file is streamed and only the statistics needed for the score 
+    are kept: the size and type histogram of every column, and the number of 
+    empties and delimiters. Memory use is therefore proportional to the number 
+    of columns times the number of types, rather than the number of cells.
+
+    Note that the "rows" that make up the table in this computation are the 
+    cells of the parsed file and the "columns" are the character positions 
+    within these cells.
+
+    Delimiters are counted per element of the table that contains one. It is 
+    not entirely trivial whether or not we should count each occurrence of a 
+    delimiter separately. However, since the normalization in the second term 
+    of (1) in Guo et al. (2011) is normalized by |R|*|C| it seems naturally to 
+    count elements.
+    """
+    empty_quoted = None
+    if not dialect.quotechar is None:
+        empty_quoted = dialect.quotechar + dialect.quotechar
+
+    n_cached = 0 if type_cache is None else len(type_cache)
+
+    R = 0
+    E = 0
+    D = 0
+    column_sizes = []
+    column_types = []
+    for row in iter_rows(data, dialect=dialect):
+        for cell in row:
+            R += 1
+            for i, element in enumerate(cell):
+                if i == len(column_sizes):
+                    column_sizes.append(0)
+                    column_types.append({})
+
+                if element == "":
+                    E += 1
+                if element == empty_quoted:
+                    E += 1
+                if element in WRANGLER_DELIMS:
+                    D += 1
+
+                column_sizes[i] += 1
+                detected_type = get_cell_type(element, type_cache=type_cache)
+                if detected_type == "empty":
+                    continue
+                type_counts = column_types[i]
+                if not detected_type in type_counts:
+                    type_counts[detected_type] = 0
+                type_counts[detected_type] += 1
+
+    C = len(column_sizes)
+
+    n_typed = sum(column_sizes)
+    count("cells_typed", n_typed)
+    if not type_cache is None:
+        count("type_cache_hits", n_typed - (len(type_cache) - n_cached))
+
+    homo = 0
+    for size, type_counts in zip(column_sizes, column_types):
+        homogeneity = 0
+        for t in type_counts:
+            homogeneity += pow(type_counts[t] / size, 2.0)
+        homo += homogeneity
 
-    homo = sum((column_homogeneity(columns[cidx]) for cidx in columns))
     if R * C == 0:
         suitability = 0
     else:
@@ -130,18 +129,14 @@ def compute_suitability(data, dialect):
 def get_dialects(data, encoding):
     delims = WRANGLER_DELIMS
     quotechars = get_potential_quotechars(data)
+    candidates = get_escape_candidates(
+        data, encoding, set(delims) | quotechars
+    )
     escapechars = {}
 
     for delim in delims:
-        delim_escapes = set()
-        for u, v in pairwise(data):
-            if v == delim and is_potential_escapechar(u, encoding):
-                delim_escapes.add(u)
         for quotechar in quotechars:
-            escapes = set(delim_escapes)
-            for u, v in pairwise(data):
-                if v == quotechar and is_potential_escapechar(u, encoding):
-                    escapes.add(u)
+            escapes = candidates[delim] | candidates[quotechar]
             escapes.add("")
             escapechars[(delim, quotechar)] = escapes
 
@@ -155,27 +150,36 @@ def get_dialects(data, encoding):
 
 
 def determine_dqr(filename, verbose=False):
-    encoding = get_encoding(filename)
-    data = load_file(filename, encoding=encoding)
+    with stage("encoding"):
+        encoding = get_encoding(filename)
+    with stage("load"):
+        data = load_file(filename, encoding=encoding)
     if data is None:
         return DetectorResult(
             status=Status.SKIP, status_msg=StatusMsg.UNREADABLE
         )
 
-    dialects = get_dialects(data, encoding)
+    with stage("dialects"):
+        dialects = get_dialects(data, encoding)
+    count("dialects", len(dialects))
     scores = []
 
-    for dialect in sorted(dialects):
-        S = compute_suitability(data, dialect)
-        if verbose:
-            print("%15r\tsuitability = %.6f" % (dialect, S))
-        scores.append((S, dialect))
+    # cell types don't depend on the dialect
+    type_cache = {}
+    with stage("scoring"):
+        for dialect in sorted(dialects):
+            S = compute_suitability(data, dialect, type_cache=type_cache)
+            if verbose:
+                print("%15r\tsuitability = %.6f" % (dialect, S))
+            scores.append((S, dialect))
 
     min_suit = min((x[0] for x in scores))
     min_dialects = [x[1] for x in scores if x[0] == min_suit]
 
     if len(min_dialects) > 1:
-        res = break_ties(data, min_dialects)
+        count("tied_dialects", len(min_dialects))
+        with stage("tie_breaking"):
+            res = break_ties(data, min_dialects)
     else:
         res = min_dialects[0]
 
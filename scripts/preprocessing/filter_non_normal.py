@@ -14,37 +14,92 @@ License: See the LICENSE file.
 import os
 import json
 
+from multiprocessing import Pool
+
 from tabulate import tabulate
 
 from .normal_forms import detect_form
 
 
-def main(input_dir, normal_file, non_normal_file):
+def read_complete_lines(filename):
+    """ Read the lines of an output file of a previous run
+
+    A run that is interrupted can leave a partially written last line, which 
+    is removed from the file such that the file of that line is classified 
+    again and new results start on a line of their own.
+
+    >>> import tempfile
+    >>> fd, tmpfname = tempfile.mkstemp()
+    >>> with os.fdopen(fd, "w") as fid:
+    ...     _ = fid.write('{"a": 1}\\n{"b"')
+    >>> read_complete_lines(tmpfname)
+    ['{"a": 1}']
+    >>> open(tmpfname).read()
+    '{"a": 1}\\n'
+    >>> os.unlink(tmpfname)
+    """
+    if not os.path.exists(filename):
+        return []
+    with open(filename, "r+") as fid:
+        lines = fid.readlines()
+        if lines and not lines[-1].endswith("\n"):
+            fid.truncate(fid.tell() - len(lines.pop().encode(fid.encoding)))
+    return [line.strip() for line in lines]
+
+
+def load_previous(normal_file, non_normal_file):
+    """ Load the form ids of the files classified in a previous run """
+    previous = {}
+    for line in read_complete_lines(normal_file):
+        data = json.loads(line)
+        previous[data["filename"]] = data["form_id"]
+    for line in read_complete_lines(non_normal_file):
+        previous[line] = None
+    return previous
+
+
+def classify(filename):
+    form_id, params = detect_form(filename, record_result=False, verbose=False)
+    return filename, form_id, params
+
+
+def main(input_dir, normal_file, non_normal_file, n_jobs=None):
+    """
+    Classify all files in the input directory, using a pool of ``n_jobs`` 
+    processes (all cores by default).
+
+    Results are appended to the output files as they come in, and files that 
+    are already in the output files are skipped, so an interrupted run can be 
+    resumed.
+    """
     files = [os.path.join(input_dir, x) for x in os.listdir(input_dir)]
     files.sort()
 
-    normal_fid = open(normal_file, "w")
-    nonnormal_fid = open(non_normal_file, "w")
+    form_ids = load_previous(normal_file, non_normal_file)
+    todo = [f for f in files if not f in form_ids]
 
-    counts = {}
+    with open(normal_file, "a") as normal_fid, open(
+        non_normal_file, "a"
+    ) as nonnormal_fid, Pool(n_jobs) as pool:
+        for f, form_id, params in pool.imap(classify, todo):
+            print("[normal_form] Analyzed file: %s" % f)
+            form_ids[f] = form_id
 
-    for f in files:
-        print("[normal_form] Analyzing file: %s" % f)
-        form_id, params = detect_form(f, record_result=False, verbose=False)
+            if form_id is None:
+                nonnormal_fid.write(f + "\n")
+                nonnormal_fid.flush()
+            else:
+                data = {"filename": f, "form_id": form_id, "params": params}
+                normal_fid.write(json.dumps(data) + "\n")
+                normal_fid.flush()
 
+    counts = {}
+    for f in files:
+        form_id = form_ids[f]
         if not form_id in counts:
             counts[form_id] = 0
         counts[form_id] += 1
 
-        if form_id is None:
-            nonnormal_fid.write(f + "\n")
-        else:
-            data = {"filename": f, "form_id": form_id, "params": params}
-            normal_fid.write(json.dumps(data) + "\n")
-
-    normal_fid.close()
-    nonnormal_fid.close()
-
     table = [
         {"form": "None" if k is None else k, "count": v}
         for k, v in counts.items()
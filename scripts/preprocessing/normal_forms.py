@@ -10,6 +10,7 @@ License: See the LICENSE file.
 
 """
 
+import functools
 import itertools
 import json
 import sys
@@ -17,10 +18,14 @@ import regex
 
 from common.encoding import get_encoding
 from common.load import load_file
-from common.escape import is_potential_escapechar
-from common.utils import pairwise
+from common.escape import get_escape_candidates
 
 DELIMS = set([",", ";", "|", "\t"])
+ESCAPE_TARGETS = DELIMS | set(['"', "'", ""])
+
+ELEMENTARY_PATTERN = regex.compile("[a-zA-Z0-9\.\_\&\-\@\+\%\(\)\ \/]+")
+NON_ELEMENTARY_FORM_6 = regex.compile(r"[^A-Za-z0-9.\_&-]")
+NON_ELEMENTARY_FORM_9 = regex.compile(r"[^A-Za-z0-9.\_&\- ]")
 
 
 def is_quoted_cell(cell, quotechar):
@@ -65,13 +70,23 @@ def has_nested_quotes(string, quotechar):
     return quotechar in string[1:-1]
 
 
+@functools.lru_cache(maxsize=16)
+def get_escape_index(data, encoding):
+    """
+    Index of the potential escape characters that precede each of the 
+    delimiters and quote characters that we consider for the normal forms. 
+    This is computed once per file and shared by all forms.
+    """
+    return get_escape_candidates(data, encoding, ESCAPE_TARGETS)
+
+
 def maybe_has_escapechar(data, encoding, delim, quotechar):
     if not delim in data and not quotechar in data:
         return False
-    for u, v in pairwise(data):
-        if v in [delim, quotechar] and is_potential_escapechar(u, encoding):
-            return True
-    return False
+    index = get_escape_index(data, encoding)
+    if not (delim in index and quotechar in index):
+        index = get_escape_candidates(data, encoding, [delim, quotechar])
+    return bool(index[delim] or index[quotechar])
 
 
 def strip_trailing_crnl(data):
@@ -90,22 +105,20 @@ def every_row_has_delim(rows, delim):
 
 
 def is_elementary(cell):
-    return not (
-        regex.fullmatch("[a-zA-Z0-9\.\_\&\-\@\+\%\(\)\ \/]+", cell) is None
-    )
+    return not (ELEMENTARY_PATTERN.fullmatch(cell) is None)
 
 
-def multiple_cell_per_row(rows, delim, quotechar=None):
-    for row in rows:
-        if len(split_row(row, delim, quotechar=quotechar)) == 1:
+def multiple_cell_per_row(row_cells):
+    for cells in row_cells:
+        if len(cells) == 1:
             return False
     return True
 
 
-def even_rows(rows, delim, quotechar=None):
+def even_rows(row_cells):
     cells_per_row = set()
-    for row in rows:
-        cells_per_row.add(len(split_row(row, delim, quotechar)))
+    for cells in row_cells:
+        cells_per_row.add(len(cells))
     return len(cells_per_row) == 1
 
 
@@ -113,6 +126,11 @@ def more_than_one_row(rows):
     return len(rows) > 1
 
 
+# The form functions below check the same file many times with different
+# parameters and often call each other, so we cache splitting the file into
+# rows and splitting the rows into cells, as well as the escape character
+# index. Use ``clear_caches`` once done with a file.
+@functools.lru_cache(maxsize=16)
 def split_file(data):
     data = strip_trailing_crnl(data)
     if "\r\n" in data:
@@ -146,6 +164,18 @@ def split_row(row, delim, quotechar):
     return cells
 
 
+@functools.lru_cache(maxsize=64)
+def split_rows(data, delim, quotechar):
+    """ Split the file into rows and every row into cells """
+    return [split_row(row, delim, quotechar) for row in split_file(data)]
+
+
+def clear_caches():
+    get_escape_index.cache_clear()
+    split_file.cache_clear()
+    split_rows.cache_clear()
+
+
 def form_escape_wrapper(form_func):
     def wrapped(data, encoding, delim, quotechar):
         if maybe_has_escapechar(data, encoding, delim, quotechar):
@@ -164,16 +194,15 @@ def is_form_1(data, encoding, delim, quotechar):
 
     if not every_row_has_delim(rows, delim):
         return (False, "no_delim")
-    if not multiple_cell_per_row(rows, delim, quotechar=quotechar):
+    row_cells = split_rows(data, delim, quotechar)
+    if not multiple_cell_per_row(row_cells):
         return (False, "single_cell")
-    if not even_rows(rows, delim, quotechar=quotechar):
+    if not even_rows(row_cells):
         return (False, "uneven_rows")
     if not more_than_one_row(rows):
         return (False, "single_row")
 
-    for row in rows:
-        cells = split_row(row, delim, quotechar)
-
+    for cells in row_cells:
         for cell in cells:
             # No empty cells
             if is_any_empty(cell):
@@ -211,16 +240,15 @@ def is_form_2(data, encoding, delim, quotechar):
 
     if not every_row_has_delim(rows, delim):
         return (False, "no_delim")
-    if not multiple_cell_per_row(rows, delim, quotechar=None):
+    row_cells = split_rows(data, delim, None)
+    if not multiple_cell_per_row(row_cells):
         return (False, "single_cell")
-    if not even_rows(rows, delim, quotechar=None):
+    if not even_rows(row_cells):
         return (False, "uneven_rows")
     if not more_than_one_row(rows):
         return (False, "single_row")
 
-    for row in rows:
-        cells = split_row(row, delim, None)
-
+    for cells in row_cells:
         for cell in cells:
             # No empty unquoted cells
             if is_empty_unquoted(cell):
@@ -250,9 +278,10 @@ def is_form_3(data, encoding, delim, quotechar):
 
     if not every_row_has_delim(rows, delim):
         return (False, "no_delim")
-    if not multiple_cell_per_row(rows, delim, quotechar=None):
+    row_cells = split_rows(data, delim, None)
+    if not multiple_cell_per_row(row_cells):
         return (False, "single_cell")
-    if not even_rows(rows, delim):
+    if not even_rows(row_cells):
         return (False, "uneven_rows")
     if not more_than_one_row(rows):
         return (False, "single_row")
@@ -262,9 +291,7 @@ def is_form_3(data, encoding, delim, quotechar):
     expected = delim * (cells_per_row - 1)
 
     empty_delimited_row_count = 0
-    for row in rows:
-        cells = split_row(row, delim, None)
-
+    for row, cells in zip(rows, row_cells):
         for cell in cells:
             # All cells must be unquoted
             if is_any_quoted_cell(cell):
@@ -302,20 +329,20 @@ def is_form_4(data, encoding, delim, quotechar):
 
     if not every_row_has_delim(rows, delim):
         return (False, "no_delim")
-    if not multiple_cell_per_row(rows, delim, quotechar=quotechar):
+    row_cells = split_rows(data, delim, quotechar)
+    if not multiple_cell_per_row(row_cells):
         return (False, "single_cell")
-    if not even_rows(rows, delim, quotechar=quotechar):
+    if not even_rows(row_cells):
         return (False, "uneven_rows")
     if not more_than_one_row(rows):
         return (False, "single_row")
 
     found_quoted_with_delim = False
 
-    for row in rows:
+    for row, cells in zip(rows, row_cells):
         if is_quoted_cell(row, quotechar) and not quotechar in row[1:-1]:
             return (False, "quoted_row")
 
-        cells = split_row(row, delim, quotechar)
         for cell in cells:
             # All cells must be unquoted unless they contain the delimiter
             if is_quoted_cell(cell, quotechar):
@@ -371,8 +398,7 @@ def is_form_6(data, encoding, delim, quotechar):
         if is_any_quoted_cell(cell):
             return (False, "quoted_cell")
 
-        search = regex.compile(r"[^A-Za-z0-9.\_&-]").search
-        if search(cell):
+        if NON_ELEMENTARY_FORM_6.search(cell):
             return (False, "non_elementary")
 
     return (True, None)
@@ -427,9 +453,10 @@ def is_form_8(data, encoding, delim, quotechar):
 
     if not every_row_has_delim(rows, delim):
         return (False, "no_delim")
-    if not multiple_cell_per_row(rows, delim, quotechar=quotechar):
+    row_cells = split_rows(data, delim, quotechar)
+    if not multiple_cell_per_row(row_cells):
         return (False, "single_cell")
-    if not even_rows(rows, delim, quotechar=quotechar):
+    if not even_rows(row_cells):
         return (False, "uneven_rows")
     if not more_than_one_row(rows):
         return (False, "single_row")
@@ -437,8 +464,7 @@ def is_form_8(data, encoding, delim, quotechar):
     quoted_cells = 0
     unquoted_cells = 0
 
-    for row in rows:
-        cells = split_row(row, delim, quotechar)
+    for cells in row_cells:
         for cell in cells:
             if is_any_empty(cell):
                 return (False, "empty_cell")
@@ -471,8 +497,7 @@ def is_form_9(data, encoding, delim, quotechar):
         if not is_quoted_cell(row, quotechar):
             return (False, "not_quoted")
 
-        search = regex.compile(r"[^A-Za-z0-9.\_&\- ]").search
-        if search(row[1:-1]):
+        if NON_ELEMENTARY_FORM_9.search(row[1:-1]):
             return (False, "non_elementary")
 
     return (True, None)
@@ -487,17 +512,17 @@ def is_form_10(data, encoding, delim, quotechar):
 
     if not every_row_has_delim(rows, delim):
         return (False, "no_delim")
-    if not multiple_cell_per_row(rows, delim, quotechar=quotechar):
+    row_cells = split_rows(data, delim, quotechar)
+    if not multiple_cell_per_row(row_cells):
         return (False, "single_cell")
-    if not even_rows(rows, delim, quotechar=quotechar):
+    if not even_rows(row_cells):
         return (False, "uneven_rows")
     if not more_than_one_row(rows):
         return (False, "single_row")
 
     quoted_empty_count = 0
 
-    for row in rows:
-        cells = split_row(row, delim, quotechar)
+    for cells in row_cells:
         for cell in cells:
             # Unquoted empty not allowed
             if is_empty_unquoted(cell):
@@ -537,16 +562,16 @@ def is_form_11(data, encoding, delim, quotechar):
 
     if not every_row_has_delim(rows, delim):
         return (False, "no_delim")
-    if not multiple_cell_per_row(rows, delim, quotechar=None):
+    row_cells = split_rows(data, delim, None)
+    if not multiple_cell_per_row(row_cells):
         return (False, "single_cell")
-    if not even_rows(rows, delim):
+    if not even_rows(row_cells):
         return (False, "uneven_rows")
     if not more_than_one_row(rows):
         return (False, "single_row")
 
     total_empty = 0
-    for row in rows:
-        cells = split_row(row, delim, None)
+    for cells in row_cells:
         num_empty = 0
         for cell in cells:
             if is_empty_unquoted(cell):
@@ -760,22 +785,25 @@ def detect_form(filename, record_result=True, verbose=True):
         return "FAIL", {}
 
     detected_forms = []
-    for form_func, options in forms:
-        for opt in dict_product(options):
-            status, error = form_func(data, encoding, **opt)
-            if status:
-                # if the form passed, then it doesn't have a potential
-                # escapechar
-                opt["escapechar"] = ""
-
-                if record_result:
-                    record_form(form_func.ID, filename, opt)
-                detected_forms.append((form_func.ID, opt))
-            elif verbose:
-                print(
-                    "Not form %s with params %r because %s"
-                    % (form_func.ID, opt, error)
-                )
+    try:
+        for form_func, options in forms:
+            for opt in dict_product(options):
+                status, error = form_func(data, encoding, **opt)
+                if status:
+                    # if the form passed, then it doesn't have a potential
+                    # escapechar
+                    opt["escapechar"] = ""
+
+                    if record_result:
+                        record_form(form_func.ID, filename, opt)
+                    detected_forms.append((form_func.ID, opt))
+                elif verbose:
+                    print(
+                        "Not form %s with params %r because %s"
+                        % (form_func.ID, opt, error)
+                    )
+    finally:
+        clear_caches()
 
     if len(detected_forms) == 0:
         if record_result:
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Wrapper around the benchmarks.
+
+See the individual scripts for more usage info.
+
+Author: Gertjan van den Burg
+Copyright (c) 2018 - The Alan Turing Institute
+License: See the LICENSE file.
+
+"""
+
+import sys
+
+from benchmark import stages, startup
+
+
+def main():
+    benchmark = sys.argv.pop(1)
+    if benchmark == "startup":
+        startup.main()
+    elif benchmark == "stages":
+        stages.main()
+    else:
+        raise ValueError("Unknown benchmark: %s" % benchmark)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,40 +4,35 @@
 """
 Wrapper for detector executables.
 
+Only the module of the selected detector is imported, to keep the startup time 
+low.
+
 Author: Gertjan van den Burg
 Copyright (c) 2018 - The Alan Turing Institute
 License: See the LICENSE file.
 
 """
 
+import importlib
 import sys
 
-from detection import (
-    our_score_full,
-    our_score_full_no_tie,
-    our_score_pattern_only,
-    our_score_type_only,
-    sniffer,
-    suitability,
-)
+DETECTORS = {
+    "our_score_full": "detection.our_score_full",
+    "our_score_full_no_tie": "detection.our_score_full_no_tie",
+    "our_score_type_only": "detection.our_score_type_only",
+    "our_score_pattern_only": "detection.our_score_pattern_only",
+    "sniffer": "detection.sniffer",
+    "suitability": "detection.suitability",
+    "hypoparsr": "detection.hypoparsr",
+}
 
 
 def main():
     detector = sys.argv.pop(1)
-    if detector == "our_score_full":
-        our_score_full.main()
-    elif detector == "our_score_full_no_tie":
-        our_score_full_no_tie.main()
-    elif detector == "our_score_type_only":
-        our_score_type_only.main()
-    elif detector == "our_score_pattern_only":
-        our_score_pattern_only.main()
-    elif detector == "sniffer":
-        sniffer.main()
-    elif detector == "suitability":
-        suitability.main()
-    else:
+    if not detector in DETECTORS:
         raise ValueError("Unknown detector: %s" % detector)
+    module = importlib.import_module(DETECTORS[detector])
+    module.main()
 
 
 if __name__ == "__main__":
@@ -15,7 +15,11 @@ import sys
 from preprocessing import filter_non_normal
 
 if __name__ == '__main__':
-    if not len(sys.argv) == 4:
-        print("Usage: %s input_dir normal_file non_normal_file" % sys.argv[0])
+    if not len(sys.argv) in [4, 5]:
+        print(
+            "Usage: %s input_dir normal_file non_normal_file [n_jobs]"
+            % sys.argv[0]
+        )
         raise SystemExit
-    filter_non_normal.main(sys.argv[1], sys.argv[2], sys.argv[3])
+    n_jobs = int(sys.argv[4]) if len(sys.argv) == 5 else None
+    filter_non_normal.main(sys.argv[1], sys.argv[2], sys.argv[3], n_jobs=n_jobs)